@@ -2,7 +2,6 @@
 import sys
 import os
 import shutil
-import requests
 import winreg
 import ctypes
 import tempfile
@@ -14,6 +13,8 @@ from PySide6.QtGui import QIcon
 import subprocess
 import json
 import src.mduyt.gui.resources_rc
+from src.mduyt.core.httpcache import get_http_cache
+from src.mduyt.core.updatedownload import DownloadCancelled, asset_digest, download_update
 
 def is_admin():
     try:
@@ -35,9 +36,7 @@ class GitHubRelease:
 
     def get_latest_release(self):
         try:
-            response = requests.get(self.api_url, headers=self.headers)
-            response.raise_for_status()
-            release_data = response.json()
+            release_data = get_http_cache().get_json(self.api_url, headers=self.headers)
             
             installer_asset = next(
                 (asset for asset in release_data['assets'] 
@@ -54,6 +53,7 @@ class GitHubRelease:
                 'description': release_data['body'],
                 'download_url': installer_asset['browser_download_url'],
                 'size': installer_asset['size'],
+                'digest': asset_digest(installer_asset),
                 'published_at': release_data['published_at']
             }
         except Exception as e:
@@ -64,37 +64,27 @@ class DownloadThread(QThread):
     finished = Signal()
     error = Signal(str)
     
-    def __init__(self, url, save_path):
+    def __init__(self, url, save_path, expected_sha256=None):
         super().__init__()
         self.url = url
         self.save_path = save_path
+        self.expected_sha256 = expected_sha256
         self._is_cancelled = False
         
     def cancel(self):
         self._is_cancelled = True
         
     def run(self):
+        def on_progress(downloaded, total):
+            if total:
+                self.progress.emit(int((downloaded / total) * 100))
+
         try:
-            response = requests.get(self.url, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 8192
-            downloaded = 0
-            
-            with open(self.save_path, 'wb') as f:
-                for data in response.iter_content(block_size):
-                    if self._is_cancelled:
-                        return
-                    
-                    downloaded += len(data)
-                    f.write(data)
-                    if total_size:
-                        progress = int((downloaded / total_size) * 100)
-                        self.progress.emit(progress)
-                        
+            download_update(self.url, self.save_path, expected_sha256=self.expected_sha256,
+                            progress_callback=on_progress, should_stop=lambda: self._is_cancelled)
             self.finished.emit()
-            
+        except DownloadCancelled:
+            return
         except Exception as e:
             self.error.emit(str(e))
 
@@ -272,7 +262,8 @@ class InstallerWindow(QMainWindow):
         
         self.download_thread = DownloadThread(
             self.release_info['download_url'], 
-            self.temp_file
+            self.temp_file,
+            self.release_info['digest']
         )
         self.download_thread.progress.connect(self.update_progress)
         self.download_thread.finished.connect(self.install_application)
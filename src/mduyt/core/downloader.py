@@ -1,28 +1,52 @@
 import os
 import re
 import subprocess
-import sys
 import platform
-import shutil
 from PySide6.QtCore import QObject, Signal
 from pathlib import Path
-from env import root
 import unicodedata
+from src.mduyt.core.engine import (ENGINE_PROCESS, ENGINE_INPROCESS, ENGINE_POOL, HookTranslator,
+                                   build_ydl_options, inprocess_available, run_inprocess)
+from src.mduyt.core.workerpool import get_worker_pool
+from src.mduyt.core.progress import (ProgressRecord, PostprocessRecord, parse_record, progress_template_args,
+                                     record_percent)
+from src.mduyt.core.segmented import DownloadStopped, download_segmented, is_direct_media_url, segmented_available
+from src.mduyt.core.integrity import SHA256, CRC32_TREE, DownloadHasher
+from src.mduyt.core.toolregistry import YT_DLP, FFMPEG, get_tool_registry
+from src.mduyt.utils.format import format_bytes, format_speed, format_eta
+
+ITEM_RE = re.compile(r'item (\d+) of (\d+)')
+PERCENT_RE = re.compile(r'(\d+(?:\.\d+)?)%')
+SIZE_RE = re.compile(r'of\s+(\S+)')
+SPEED_RE = re.compile(r'at\s+(\S+)')
+ETA_RE = re.compile(r'ETA\s+(\S+)')
+DESTINATION_RE = re.compile(r'\[(?:download|ExtractAudio|Merger)\] (?:Destination|Merging formats into): (.+)$')
 
 class DownloaderSignals(QObject):
     progress = Signal(float, str, str, str, int, int)
     title_fetched = Signal(str)
-    file_downloaded = Signal(str, str, str)
+    # filename, directory, file type, title, uploader; the last two are empty when yt-dlp did not report them
+    file_downloaded = Signal(str, str, str, str, str)
     finished = Signal()
     error = Signal(str)
 
 class Downloader(QObject):
-    def __init__(self):
+    def __init__(self, engine=ENGINE_PROCESS):
         super().__init__()
+        if engine in (ENGINE_INPROCESS, ENGINE_POOL) and not inprocess_available():
+            print("yt_dlp module not available, falling back to the yt-dlp binary")
+            engine = ENGINE_PROCESS
+        self.engine = engine
+        # Ranged connections used for direct media links and single-file formats
+        self.segments = 8 if segmented_available() else 0
+        # {file path: {algorithm: hexdigest}} for files whose bytes this downloader wrote itself
+        self.digests = {}
         self.system = platform.system().lower()
-        self.workdir = self.get_workdir()
-        self.yt_dlp_binary = self.get_yt_dlp_binary()
-        self.ffmpeg_binary = self.get_ffmpeg_binary()
+        # Resolved once per process; versions are probed lazily and cached on disk
+        self.tools = get_tool_registry()
+        self.workdir = self.tools.workdir
+        self.yt_dlp_binary = self.tools.path(YT_DLP)
+        self.ffmpeg_binary = self.tools.path(FFMPEG)
         self.signals = DownloaderSignals()
         self.process = None
         self.stop_flag = False
@@ -30,84 +54,34 @@ class Downloader(QObject):
         self.audio_file = None
         self.download_dir = None
 
-    rootpath = root
-    def get_workdir(self):
-        if self.system == 'windows':  # Windows
-            return os.path.join(self.rootpath, 'bin', 'win')
-        elif self.system == 'darwin':  # macOS
-            if getattr(sys, 'frozen', False):
-                # Inside the bundled .app, construct the absolute path to bin/mac
-                return os.path.abspath(os.path.join(self.rootpath, '..', 'Frameworks', 'bin', 'mac'))
-            else:
-                # During development or non-bundled execution
-                return os.path.join(self.rootpath, 'bin', 'mac')
-        elif self.system.startswith('linux'):  # Linux
-            return '/usr/local/bin'  # Default location for user-installed binaries
-        else:
-            raise OSError(f"Unsupported operating system: {self.system}")
-
-    def get_yt_dlp_binary(self):
-        if self.system == 'windows':
-            return os.path.join(self.workdir, 'yt-dlp.exe')
-        elif self.system == 'darwin':
-            return os.path.join(self.workdir, 'yt-dlp')
-        elif self.system == 'linux':
-            return self.get_linux_binary('yt-dlp')
-        else:
-            raise OSError(f"Unsupported operating system: {self.system}")
-    
-    def get_ffmpeg_binary(self):
-        if self.system == 'windows':
-            return os.path.join(self.workdir, 'ffmpeg.exe')
-        elif self.system == 'darwin':
-            return os.path.join(self.workdir, 'ffmpeg')
-        elif self.system == 'linux':
-            return self.get_linux_binary('ffmpeg')
-        else:
-            raise OSError(f"Unsupported operating system: {self.system}")        
-
-    def get_linux_binary(self, binary_name):
-        if shutil.which(binary_name):
-            return binary_name
-
-        package_managers = [
-            ('apt-get', f'apt install -y {binary_name}'),
-            ('pacman', f'pacman -S --noconfirm {binary_name}'),
-            ('dnf', f'dnf install -y {binary_name}'),
-            ('yum', f'yum install -y {binary_name}'),
-            ('zypper', f'zypper install -y {binary_name}')
-        ]
-
-        for pm, install_cmd in package_managers:
-            if shutil.which(pm):
-                try:
-                    subprocess.run(['sudo', pm, 'update'], check=True)
-                    subprocess.run(['sudo'] + install_cmd.split(), check=True)
-                    return binary_name
-                except subprocess.CalledProcessError:
-                    print(f"Failed to install {binary_name} using {pm}")
-
-        print(f"Using bundled {binary_name} binary")
-        return os.path.join(bin, 'linux', binary_name)
-    
-    def download(self, url, is_audio, audio_format, resolution, fps, download_dir, is_playlist, with_thumbnail):
+    def download(self, url, is_audio, audio_format, resolution, fps, download_dir, is_playlist, with_thumbnail,
+                 output_template=None):
         self.download_dir = download_dir
         self.video_file = None
         self.audio_file = None
         self.is_audio_download = is_audio
 
+        # Saved as is: extraction and thumbnails still need yt-dlp's post-processors
+        if self.segments and is_direct_media_url(url) and not is_audio and not with_thumbnail:
+            return self.download_direct(url, download_dir)
+
+        if self.engine in (ENGINE_INPROCESS, ENGINE_POOL):
+            return self.download_inprocess(url, is_audio, audio_format, resolution, fps, download_dir,
+                                           is_playlist, with_thumbnail, output_template)
+
         try:
-            self.stop_flag = False
-            if self.system == 'windows':
-                cmd = [self.yt_dlp_binary, url, '--no-mtime', '--newline']
-            elif self.system == 'darwin':
-                cmd = [self.yt_dlp_binary, url, '--no-mtime', '--newline', f'--ffmpeg-location={self.workdir}']
+            cmd = [self.yt_dlp_binary, url, '--no-mtime', '--newline', '--continue']
+            ffmpeg_location = self.tools.ffmpeg_location()
+            if ffmpeg_location:
+                cmd.append(f'--ffmpeg-location={ffmpeg_location}')
             print(self.yt_dlp_binary)
             print(self.yt_dlp_binary)
 
             cmd.extend(['-P', download_dir])
 
-            if is_playlist:
+            if output_template:
+                cmd.extend(['--output', output_template])
+            elif is_playlist:
                 cmd.extend(['--output', '%(playlist_title)s/%(title)s.%(ext)s'])
             else:
                 cmd.extend(['--output', '%(title)s.%(ext)s'])
@@ -129,6 +103,7 @@ class Downloader(QObject):
                     cmd.append(f'--fps={fps}')
 
             cmd.append('--yes-playlist' if is_playlist else '--no-playlist')
+            cmd.extend(progress_template_args())
 
             self.process = subprocess.Popen(
                 cmd,
@@ -140,59 +115,141 @@ class Downloader(QObject):
 
             current_item = 0
             total_items = 1
+            structured = False
+            # Destinations seen by the text fallback; reported only if no MoveFiles record ever arrives
+            text_destinations = []
+            last_error = None
             for line in self.process.stdout:
                 if self.stop_flag:
                     self.process.terminate()
                     self.signals.error.emit("Download stopped by user")
-                    return
-
+                    return False
+
+                if line.startswith('ERROR:'):
+                    # Kept so the failure can be classified for retries instead of just an exit code
+                    last_error = line.strip()
+                    continue
+
+                record = parse_record(line)
+                if record is not None:
+                    structured = True
+                    self.handle_record(record)
+                    continue
+                if structured:
+                    continue
+
+                # Plain text output, only seen with yt-dlp builds that ignore --progress-template
                 if '[download] Downloading item' in line:
-                    match = re.search(r'item (\d+) of (\d+)', line)
+                    match = ITEM_RE.search(line)
                     if match:
                         current_item = int(match.group(1))
                         total_items = int(match.group(2))
+                elif '[download] Destination:' in line:
+                    text_destinations.append(self.parse_destination(line))
                 elif '[download]' in line:
                     progress, file_size, download_speed, eta = self.parse_progress(line)
                     self.signals.progress.emit(progress, file_size, download_speed, eta, current_item, total_items)
-                elif '[download] Destination:' in line:
-                    self.parse_destination(line)
                 elif '[ExtractAudio] Destination:' in line or '[Merger] Merging formats into' in line:
-                    self.parse_destination(line)
+                    text_destinations.append(self.parse_destination(line))
 
             self.process.wait()
+            if not structured:
+                # A yt-dlp build that ignores --progress-template
+                for file_path in filter(None, text_destinations):
+                    self.emit_downloaded_file(file_path)
             if self.process.returncode != 0 and not self.stop_flag:
-                self.signals.error.emit(f"yt-dlp exited with code {self.process.returncode}")
+                self.signals.error.emit(last_error or f"yt-dlp exited with code {self.process.returncode}")
+                return False
             elif not self.stop_flag:
                 self.signals.finished.emit()
+                return True
+            return False
 
         except Exception as e:
             self.signals.error.emit(str(e))
             print(self.yt_dlp_binary)
+            return False
+
+    def download_inprocess(self, url, is_audio, audio_format, resolution, fps, download_dir, is_playlist, with_thumbnail,
+                           output_template=None):
+        ffmpeg_location = self.tools.ffmpeg_location()
+        options = build_ydl_options(url, is_audio, audio_format, resolution, fps, download_dir,
+                                    is_playlist, with_thumbnail, ffmpeg_location, output_template)
+        try:
+            if self.engine == ENGINE_POOL:
+                error = get_worker_pool().run(url, options, self.signals.progress.emit, self.emit_downloaded_file,
+                                              lambda: self.stop_flag, self.segments)
+            else:
+                translator = HookTranslator(self.signals.progress.emit, self.emit_downloaded_file,
+                                            lambda: self.stop_flag)
+                error = run_inprocess(url, options, translator, self.segments)
+        except Exception as e:
+            error = str(e)
+
+        if error:
+            self.signals.error.emit(error)
+            return False
+        self.signals.finished.emit()
+        return True
+
+    def download_direct(self, url, download_dir):
+        def on_progress(downloaded, total, speed):
+            progress = min(downloaded / total * 100, 100.0) if total else 0.0
+            eta = (total - downloaded) / speed if total and speed else None
+            self.signals.progress.emit(progress, format_bytes(total or None), format_speed(speed), format_eta(eta), 0, 1)
+
+        hasher = DownloadHasher((SHA256, CRC32_TREE))
+        try:
+            file_path = download_segmented(url, download_dir, connections=self.segments,
+                                           progress_callback=on_progress, should_stop=lambda: self.stop_flag,
+                                           hasher=hasher)
+        except DownloadStopped:
+            self.signals.error.emit("Download stopped by user")
+            return False
+        except Exception as e:
+            self.signals.error.emit(str(e))
+            return False
+
+        self.digests[file_path] = hasher.digests
+        self.emit_downloaded_file(file_path)
+        self.signals.finished.emit()
+        return True
 
     def stop(self):
         self.stop_flag = True
         if self.process:
             self.process.terminate()
 
+    def handle_record(self, record):
+        if isinstance(record, ProgressRecord):
+            if record.status == 'downloading':
+                self.signals.progress.emit(record_percent(record), format_bytes(record.total_bytes),
+                                           format_speed(record.speed), format_eta(record.eta),
+                                           record.playlist_index, record.playlist_count)
+        elif isinstance(record, PostprocessRecord):
+            # MoveFiles is the last post-processor yt-dlp runs, its filepath is the final file
+            if record.status == 'finished' and record.postprocessor == 'MoveFiles' and record.filepath:
+                self.emit_downloaded_file(record.filepath, record.title, record.uploader)
+
     def parse_progress(self, line):
         progress = 0
         file_size = ""
         download_speed = ""
         eta = ""
 
-        match = re.search(r'(\d+(?:\.\d+)?)%', line)
+        match = PERCENT_RE.search(line)
         if match:
             progress = float(match.group(1))
 
-        size_match = re.search(r'of\s+(\S+)', line)
+        size_match = SIZE_RE.search(line)
         if size_match:
             file_size = size_match.group(1)
 
-        speed_match = re.search(r'at\s+(\S+)', line)
+        speed_match = SPEED_RE.search(line)
         if speed_match:
             download_speed = speed_match.group(1)
 
-        eta_match = re.search(r'ETA\s+(\S+)', line)
+        eta_match = ETA_RE.search(line)
         if eta_match:
             eta = eta_match.group(1)
 
@@ -200,34 +257,39 @@ class Downloader(QObject):
 
 
     def parse_destination(self, line):
-        match = re.search(r'\[(?:download|ExtractAudio|Merger)\] (?:Destination|Merging formats into): (.+)$', line)
+        match = DESTINATION_RE.search(line)
         if match:
             file_path = match.group(1).strip()
             
             # Remove quotes if present
             if file_path.startswith('"') and file_path.endswith('"'):
                 file_path = file_path[1:-1]
-            
-            # Ensure the file_path is absolute
-            if not os.path.isabs(file_path):
-                file_path = os.path.join(self.download_dir, file_path)
-            
-            # Normalize the path
-            file_path = os.path.normpath(file_path)
-            
-            # Get the filename and directory path separately
-            filename = os.path.basename(file_path)
-            dir_path = os.path.dirname(file_path)
-            
-            # Determine the file type
-            file_type = self.determine_file_type(filename)
-            
-            # Normalize the paths
-            normalized_filename = self.normalize_unicode(filename)
-            normalized_path = self.normalize_unicode(dir_path)
-            
-            # Emit the file_downloaded signal
-            self.signals.file_downloaded.emit(normalized_filename, normalized_path, file_type)
+
+            return file_path
+        return None
+
+    def emit_downloaded_file(self, file_path, title='', uploader=''):
+        # Ensure the file_path is absolute
+        if not os.path.isabs(file_path):
+            file_path = os.path.join(self.download_dir, file_path)
+        
+        # Normalize the path
+        file_path = os.path.normpath(file_path)
+        
+        # Get the filename and directory path separately
+        filename = os.path.basename(file_path)
+        dir_path = os.path.dirname(file_path)
+        
+        # Determine the file type
+        file_type = self.determine_file_type(filename)
+        
+        # Normalize the paths
+        normalized_filename = self.normalize_unicode(filename)
+        normalized_path = self.normalize_unicode(dir_path)
+        
+        # Emit the file_downloaded signal
+        self.signals.file_downloaded.emit(normalized_filename, normalized_path, file_type,
+                                          self.normalize_unicode(title), self.normalize_unicode(uploader))
 
     def determine_file_type(self, filename):
         if self.is_audio_download:
@@ -245,6 +307,9 @@ class Downloader(QObject):
         if not self.video_file:
             self.signals.error.emit("Video file not available for processing")
             return
+        if not self.tools.has_encoder(codec):
+            self.signals.error.emit(f"This ffmpeg build has no {codec} encoder")
+            return
 
         try:
             output_path, output_filename = os.path.split(output_file)
@@ -285,7 +350,8 @@ class Downloader(QObject):
                 self.signals.error.emit(f"FFmpeg exited with code {process.returncode}")
             else:
                 output_file_path = f'{os.path.join(output_path, output_name)}.mp4'
-                self.signals.file_downloaded.emit(os.path.basename(output_file_path), output_file_path, "Processed Clip")
+                self.signals.file_downloaded.emit(os.path.basename(output_file_path), output_file_path, "Processed Clip",
+                                                  "", "")
 
         except Exception as e:
             self.signals.error.emit(str(e))
\ No newline at end of file
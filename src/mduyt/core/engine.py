@@ -0,0 +1,165 @@
+import os
+from src.mduyt.utils.format import format_bytes, format_speed, format_eta
+from src.mduyt.core.segmented import download_segmented, segmented_available
+
+try:
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadCancelled, DownloadError, sanitize_filename as ytdlp_sanitize_filename
+except ImportError:
+    YoutubeDL = None
+    ytdlp_sanitize_filename = None
+
+    class DownloadCancelled(Exception):
+        pass
+
+    class DownloadError(Exception):
+        pass
+
+ENGINE_PROCESS = "process"
+ENGINE_INPROCESS = "inprocess"
+ENGINE_POOL = "pool"
+
+def inprocess_available():
+    return YoutubeDL is not None
+
+def is_youtube_url(url):
+    return "youtube.com" in url or "youtu.be" in url
+
+def build_ydl_options(url, is_audio, audio_format, resolution, fps, download_dir, is_playlist, with_thumbnail,
+                      ffmpeg_location=None, output_template=None):
+    """Build YoutubeDL params equivalent to the yt-dlp command line used by Downloader"""
+    opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'updatetime': False,
+        # Keep .part files of a stopped or killed job and resume them on the next attempt
+        'continuedl': True,
+        'paths': {'home': download_dir},
+        'outtmpl': output_template or ('%(playlist_title)s/%(title)s.%(ext)s' if is_playlist else '%(title)s.%(ext)s'),
+        'noplaylist': not is_playlist,
+        'postprocessors': [],
+    }
+    if ffmpeg_location:
+        opts['ffmpeg_location'] = ffmpeg_location
+
+    if is_audio:
+        opts['format'] = 'bestaudio/best'
+        opts['postprocessors'].append({'key': 'FFmpegExtractAudio', 'preferredcodec': audio_format})
+    elif is_youtube_url(url):
+        fps_filter = f"[fps<={fps}]" if fps and fps.isdigit() else ""
+        opts['format'] = (f"bestvideo[height<={resolution}][ext=mp4]{fps_filter}+bestaudio[ext=m4a]"
+                          f"/best[ext=mp4]/best")
+
+    if with_thumbnail:
+        opts['writethumbnail'] = True
+        opts['postprocessors'].extend([
+            {'key': 'FFmpegMetadata', 'add_metadata': True},
+            {'key': 'EmbedThumbnail'},
+        ])
+    return opts
+
+class HookTranslator:
+    """Turns YoutubeDL progress/postprocessor hook dicts into DownloaderSignals-shaped callbacks"""
+
+    def __init__(self, on_progress, on_file, should_stop=lambda: False):
+        self.on_progress = on_progress
+        self.on_file = on_file
+        self.should_stop = should_stop
+
+    def progress_hook(self, d):
+        if self.should_stop():
+            raise DownloadCancelled("Download stopped by user")
+        if d.get('status') != 'downloading':
+            return
+
+        downloaded = d.get('downloaded_bytes') or 0
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        progress = downloaded / total * 100 if total else 0.0
+
+        info = d.get('info_dict') or {}
+        current_item = info.get('playlist_index') or 0
+        total_items = info.get('n_entries') or info.get('playlist_count') or 1
+
+        self.on_progress(min(progress, 100.0), format_bytes(total), format_speed(d.get('speed')),
+                         format_eta(d.get('eta')), int(current_item), int(total_items))
+
+    def postprocessor_hook(self, d):
+        if self.should_stop():
+            raise DownloadCancelled("Download stopped by user")
+        # MoveFiles is the last post-processor yt-dlp runs, its filepath is the final file
+        if d.get('status') == 'finished' and d.get('postprocessor') == 'MoveFiles':
+            info = d.get('info_dict') or {}
+            if info.get('filepath'):
+                self.on_file(info['filepath'], info.get('title') or '', info.get('uploader') or '')
+
+class ErrorLogger:
+    """YoutubeDL logger that keeps the last error instead of printing to a console"""
+
+    def __init__(self):
+        self.last_error = None
+
+    def debug(self, msg):
+        pass
+
+    def info(self, msg):
+        pass
+
+    def warning(self, msg):
+        pass
+
+    def error(self, msg):
+        self.last_error = msg
+
+def is_segmentable(info):
+    """True when yt-dlp selected one plain http(s) file that can be fetched over ranged connections"""
+    return (info.get('_type', 'video') == 'video' and not info.get('requested_formats')
+            and info.get('protocol') in ('http', 'https') and bool(info.get('url')))
+
+def download_with_segments(ydl, url, translator, connections):
+    """Resolve url, fetch a single-file format with the segmented downloader and let yt-dlp post-process it"""
+    info = ydl.extract_info(url, download=False)
+    if info.get('_type', 'video') != 'video':
+        return ydl.download([url])
+
+    if is_segmentable(info):
+        temp_filename = ydl.prepare_filename(info, 'temp')
+        os.makedirs(os.path.dirname(os.path.abspath(temp_filename)), exist_ok=True)
+
+        def on_progress(downloaded, total, speed):
+            eta = (total - downloaded) / speed if total and speed else None
+            translator.progress_hook({'status': 'downloading', 'downloaded_bytes': downloaded,
+                                      'total_bytes': total or None, 'speed': speed, 'eta': eta,
+                                      'info_dict': info})
+
+        download_segmented(info['url'], os.path.dirname(os.path.abspath(temp_filename)),
+                           os.path.basename(temp_filename), info.get('http_headers'), connections, on_progress)
+
+    # An existing file is reused by yt-dlp, so this only merges/post-processes and moves it into place
+    ydl.process_info(info)
+    return 0
+
+def run_inprocess(url, options, translator, segments=0):
+    """Download url with an in-process YoutubeDL, returns None on success or an error message.
+
+    With segments > 0, a single-file http(s) format is downloaded over that many ranged
+    connections instead of yt-dlp's single stream.
+    """
+    logger = ErrorLogger()
+    params = dict(options,
+                  logger=logger,
+                  progress_hooks=[translator.progress_hook],
+                  postprocessor_hooks=[translator.postprocessor_hook])
+    try:
+        with YoutubeDL(params) as ydl:
+            if segments and segmented_available() and options.get('noplaylist'):
+                retcode = download_with_segments(ydl, url, translator, segments)
+            else:
+                retcode = ydl.download([url])
+    except DownloadCancelled:
+        return "Download stopped by user"
+    except DownloadError as e:
+        return logger.last_error or str(e)
+    if retcode != 0:
+        return logger.last_error or f"yt-dlp exited with code {retcode}"
+    return None
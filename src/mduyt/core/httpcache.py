@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from src.mduyt.utils.paths import user_cache_dir
+
+# Connect and read timeouts for metadata requests
+REQUEST_TIMEOUT = (5, 30)
+DEFAULT_MAX_AGE = 10 * 60
+
+def default_cache_path():
+    return os.path.join(user_cache_dir(), 'http-cache.json')
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """One pooled requests.Session for every metadata and update request in the process"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+class HttpCache:
+    """Small on-disk cache for JSON metadata such as GitHub's releases/latest.
+
+    A response younger than max_age is returned without touching the network. An older
+    one is revalidated with If-None-Match / If-Modified-Since; a 304 just refreshes it,
+    which GitHub does not count against the API rate limit. When the network is down a
+    cached response is returned whatever its age, so only a first request can fail.
+    """
+
+    def __init__(self, path=None, max_age=DEFAULT_MAX_AGE, session=None):
+        self.path = path or default_cache_path()
+        self.max_age = max_age
+        self.session = session or get_session()
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save HTTP cache: {e}")
+
+    def get_json(self, url, headers=None, max_age=None, timeout=REQUEST_TIMEOUT):
+        """Decoded JSON body of url, raises requests.RequestException if nothing usable is cached"""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry and time.time() - entry['fetched_at'] < max_age:
+            return entry['body']
+
+        request_headers = dict(headers or {})
+        if entry and entry.get('etag'):
+            request_headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.session.get(url, headers=request_headers, timeout=timeout)
+            if response.status_code == 304 and not entry:
+                # Validators from the caller, but nothing cached to revalidate: ask for the body itself
+                request_headers = {name: value for name, value in request_headers.items()
+                                   if name.lower() not in ('if-none-match', 'if-modified-since')}
+                response = self.session.get(url, headers=request_headers, timeout=timeout)
+                if response.status_code == 304:
+                    raise requests.HTTPError(f"304 Not Modified for {url} with nothing cached", response=response)
+            if response.status_code != 304:
+                response.raise_for_status()
+                body = response.json()
+        except (requests.RequestException, ValueError):
+            if entry:
+                return entry['body']
+            raise
+
+        with self._lock:
+            if response.status_code == 304:
+                entry['fetched_at'] = time.time()
+            else:
+                entry = {'body': body, 'etag': response.headers.get('ETag'),
+                         'last_modified': response.headers.get('Last-Modified'), 'fetched_at': time.time()}
+                self._entries[url] = entry
+            self._save()
+        return entry['body']
+
+    def invalidate(self, url=None):
+        with self._lock:
+            if url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(url, None)
+            self._save()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_http_cache():
+    """Metadata cache shared by the updaters in this process"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache()
+        return _cache
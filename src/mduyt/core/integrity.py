@@ -0,0 +1,180 @@
+import os
+import zlib
+import struct
+import hashlib
+
+SHA256 = 'sha256'
+# Fast, non-cryptographic: CRC32 per block, combined into a SHA-256 over the block list
+CRC32_TREE = 'crc32-tree'
+
+TREE_BLOCK_SIZE = 1024 * 1024
+# Bytes read back from the file per write while the SHA-256 frontier catches up
+READ_BACK_BUDGET = 1024 * 1024
+
+def read_at(fd, size, offset):
+    if hasattr(os, 'pread'):
+        return os.pread(fd, size, offset)
+    # No pread on Windows; callers run on one thread, so this cannot interleave with a write
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, size)
+
+def merge_range(ranges, start, end):
+    """Insert [start, end) into a sorted list of disjoint ranges, merging neighbours"""
+    merged = []
+    for range_start, range_end in ranges:
+        if range_end < start or range_start > end:
+            merged.append((range_start, range_end))
+        else:
+            start, end = min(start, range_start), max(end, range_end)
+    merged.append((start, end))
+    merged.sort()
+    return merged
+
+class FrontierHasher:
+    """Canonical digest of a file written out of order.
+
+    Bytes written at the frontier (the end of the contiguous prefix hashed so far) go
+    straight from memory into the hash. Bytes written further ahead are remembered as
+    ranges and read back once the frontier reaches them, at most read_back_budget bytes
+    per write, so they usually come from the page cache shortly after being written.
+    """
+
+    def __init__(self, algorithm=SHA256, read_back_budget=READ_BACK_BUDGET):
+        self.hash = hashlib.new(algorithm)
+        self.read_back_budget = read_back_budget
+        self.frontier = 0
+        self.ahead = []
+        self.fd = None
+
+    def add_existing(self, ranges):
+        for start, end in ranges:
+            self.ahead = merge_range(self.ahead, start, end)
+
+    def update_at(self, offset, data):
+        end = offset + len(data)
+        if offset <= self.frontier < end:
+            self.hash.update(memoryview(data)[self.frontier - offset:])
+            self.frontier = end
+        elif offset > self.frontier:
+            self.ahead = merge_range(self.ahead, offset, end)
+        self._read_back(self.read_back_budget)
+
+    def _read_back(self, budget):
+        while self.ahead and self.ahead[0][0] <= self.frontier and budget > 0:
+            end = self.ahead[0][1]
+            if end <= self.frontier:
+                self.ahead.pop(0)
+                continue
+            data = read_at(self.fd, min(end - self.frontier, budget), self.frontier)
+            if not data:
+                raise IOError(f"Unexpected end of file at byte {self.frontier} while hashing")
+            self.hash.update(data)
+            self.frontier += len(data)
+            budget -= len(data)
+
+    def finish(self, file_size):
+        self._read_back(float('inf'))
+        if self.frontier != file_size:
+            raise IOError(f"Only {self.frontier} of {file_size} bytes were hashed, the file has gaps")
+        return self.hash.hexdigest()
+
+class BlockTreeHasher:
+    """Order-independent checksum: CRC32 of every fixed-size block, combined by a SHA-256.
+
+    Each block is checksummed as its bytes arrive in order, which is the common case
+    since connections write their ranges front to back. A block that was not written in
+    one sequential run (split between two ranges, or already on disk when resuming) is
+    read back once at the end.
+    """
+
+    def __init__(self, block_size=TREE_BLOCK_SIZE):
+        self.block_size = block_size
+        self.running = {}
+        self.checksums = {}
+        self.fd = None
+
+    def update_at(self, offset, data):
+        view = memoryview(data)
+        while view:
+            block, block_offset = divmod(offset, self.block_size)
+            size = min(len(view), self.block_size - block_offset)
+            state = self.running.get(block)
+            if block_offset == 0:
+                state = (0, 0)
+            if state is not None and state[0] == block_offset:
+                self.running[block] = (block_offset + size, zlib.crc32(view[:size], state[1]))
+            else:
+                # Not sequential, leave the block to the read-back in finish()
+                self.running.pop(block, None)
+            view = view[size:]
+            offset += size
+
+    def _complete(self, file_size):
+        blocks = (file_size + self.block_size - 1) // self.block_size
+        for block in range(blocks):
+            length = min(self.block_size, file_size - block * self.block_size)
+            state = self.running.pop(block, None)
+            if state is not None and state[0] == length:
+                self.checksums[block] = state[1]
+            elif block not in self.checksums:
+                data = read_at(self.fd, length, block * self.block_size)
+                if len(data) != length:
+                    raise IOError(f"Unexpected end of file in block {block} while hashing")
+                self.checksums[block] = zlib.crc32(data)
+        return blocks
+
+    def finish(self, file_size):
+        blocks = self._complete(file_size)
+        packed = struct.pack(f'<QI{blocks}I', file_size, self.block_size, *(self.checksums[b] for b in range(blocks)))
+        return hashlib.sha256(packed).hexdigest()
+
+HASHERS = {SHA256: FrontierHasher, CRC32_TREE: BlockTreeHasher}
+
+class DownloadHasher:
+    """Digests of a file computed while it is written, with no second pass over the disk.
+
+    update_at() takes the bytes just written at offset, in any order. The file descriptor
+    the bytes went to is attached so out-of-order ranges can be read back. finish()
+    returns {algorithm: hexdigest} once every byte has been written.
+    """
+
+    def __init__(self, algorithms=(SHA256,)):
+        self.hashers = {name: HASHERS[name]() for name in algorithms}
+        self.position = 0
+        self.digests = {}
+
+    def attach(self, fd):
+        for hasher in self.hashers.values():
+            hasher.fd = fd
+
+    def add_existing(self, ranges):
+        """Ranges already on disk from an earlier, interrupted attempt"""
+        for hasher in self.hashers.values():
+            if hasattr(hasher, 'add_existing'):
+                hasher.add_existing(ranges)
+
+    def update_at(self, offset, data):
+        for hasher in self.hashers.values():
+            hasher.update_at(offset, data)
+
+    def update(self, data):
+        """Sequential writes, e.g. a plain streamed download"""
+        self.update_at(self.position, data)
+        self.position += len(data)
+
+    def finish(self, file_size=None):
+        if file_size is None:
+            file_size = self.position
+        self.digests = {name: hasher.finish(file_size) for name, hasher in self.hashers.items()}
+        return self.digests
+
+def hash_file(path, algorithms=(SHA256,), block_size=1024 * 1024):
+    """Digests of an existing file, the same values DownloadHasher produces while writing it"""
+    hasher = DownloadHasher(algorithms)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            hasher.update(data)
+    return hasher.finish()
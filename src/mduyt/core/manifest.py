@@ -0,0 +1,268 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+import zipfile
+from src.mduyt.core.httpcache import REQUEST_TIMEOUT, get_session
+from src.mduyt.core.integrity import SHA256, hash_file
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_FORMAT = 1
+STAGING_DIR = '.update'
+OLD_SUFFIX = '.old'
+# Changed entries closer together than this in the zip are fetched with one request
+RANGE_GAP = 256 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+class RangeNotSupported(Exception):
+    pass
+
+def data_offset(f, info):
+    """Offset of an entry's compressed bytes, past its local header (whose extra field may differ from the central one)"""
+    f.seek(info.header_offset)
+    header = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+    if header[0] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    name_length, extra_length = header[9], header[10]
+    return info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+
+def build_manifest(zip_path, version):
+    """Manifest of a portable zip: every file's size and SHA-256, and where its bytes sit in the zip"""
+    files = {}
+    with zipfile.ZipFile(zip_path) as archive, open(zip_path, 'rb') as raw:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            digest = hashlib.sha256()
+            with archive.open(info) as member:
+                for chunk in iter(lambda: member.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            files[info.filename] = {'size': info.file_size, 'sha256': digest.hexdigest(),
+                                    'offset': data_offset(raw, info), 'compressed_size': info.compress_size,
+                                    'compression': info.compress_type}
+    return {'format': MANIFEST_FORMAT, 'version': version, 'package': os.path.basename(zip_path),
+            'package_size': os.path.getsize(zip_path), 'files': files}
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == MANIFEST_FORMAT else None
+
+def save_manifest(path, manifest):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(temp_path, path)
+
+def local_path(app_dir, name):
+    return os.path.join(app_dir, *name.split('/'))
+
+def changed_files(manifest, app_dir, installed=None):
+    """Names in manifest whose local copy is missing or different.
+
+    Files whose size and mtime still match what the installed manifest recorded are taken
+    on trust, so an update only hashes the files that were touched since the last one.
+    """
+    installed_files = (installed or {}).get('files', {})
+    changed = []
+    for name, entry in manifest['files'].items():
+        path = local_path(app_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            changed.append(name)
+            continue
+        if stat.st_size != entry['size']:
+            changed.append(name)
+            continue
+        known = installed_files.get(name)
+        if known and known.get('mtime') == stat.st_mtime and known.get('size') == stat.st_size:
+            digest = known['sha256']
+        else:
+            digest = hash_file(path)[SHA256]
+        if digest != entry['sha256']:
+            changed.append(name)
+    return changed
+
+def removed_files(manifest, installed):
+    """Files the previous update installed that the new version no longer has"""
+    if not installed:
+        # Without a record of what was installed, everything else may belong to the user
+        return []
+    return [name for name in installed.get('files', {}) if name not in manifest['files']]
+
+def group_ranges(entries, gap=RANGE_GAP):
+    """Sort (name, entry) by offset and group neighbours into [(start, end, [(name, entry)...])]"""
+    groups = []
+    for name, entry in sorted(entries, key=lambda item: item[1]['offset']):
+        start = entry['offset']
+        end = start + entry['compressed_size']
+        if groups and start - groups[-1][1] <= gap:
+            groups[-1][1] = max(groups[-1][1], end)
+            groups[-1][2].append((name, entry))
+        else:
+            groups.append([start, end, [(name, entry)]])
+    return groups
+
+class EntryWriter:
+    """Inflates one zip entry's compressed bytes into a staged file and checks its SHA-256"""
+
+    def __init__(self, name, entry, path):
+        if entry['compression'] not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise RangeNotSupported(f"Compression method {entry['compression']} of {name}")
+        self.name = name
+        self.entry = entry
+        self.path = path
+        self.inflater = zlib.decompressobj(-15) if entry['compression'] == zipfile.ZIP_DEFLATED else None
+        self.digest = hashlib.sha256()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'wb')
+
+    def write(self, data):
+        if self.inflater:
+            try:
+                data = self.inflater.decompress(data)
+            except zlib.error as e:
+                self.file.close()
+                raise IOError(f"Corrupt data for {self.name}: {e}")
+        self.digest.update(data)
+        self.file.write(data)
+
+    def close(self):
+        if self.inflater:
+            data = self.inflater.flush()
+            self.digest.update(data)
+            self.file.write(data)
+        self.file.close()
+        if self.digest.hexdigest() != self.entry['sha256']:
+            os.remove(self.path)
+            raise IOError(f"Checksum mismatch for {self.name}")
+
+def fetch_entries(package_url, names, manifest, staging_dir, progress_callback=None, session=None):
+    """Fetch the named files out of the remote zip with Range requests into staging_dir.
+
+    Raises RangeNotSupported when the server ignores Range, IOError when a file fails its
+    checksum or the connection drops and requests.RequestException for other request
+    errors; the caller can fall back to downloading the whole package on any of them.
+    """
+    session = session or get_session()
+    entries = [(name, manifest['files'][name]) for name in names]
+    for name, entry in entries:
+        if not entry['compressed_size']:
+            # Nothing to fetch for an empty stored file
+            EntryWriter(name, entry, local_path(staging_dir, name)).close()
+    groups = group_ranges([(name, entry) for name, entry in entries if entry['compressed_size']])
+    total = sum(end - start for start, end, _ in groups)
+    fetched = 0
+    for start, end, members in groups:
+        headers = {'Range': f'bytes={start}-{end - 1}'}
+        with session.get(package_url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RangeNotSupported(f"Server answered a range request with {response.status_code}")
+            position = start
+            pending = list(members)
+            current = None
+            for chunk in response.iter_content(CHUNK_SIZE):
+                view = memoryview(chunk)
+                while view:
+                    if current is None:
+                        if not pending:
+                            view = view[:0]
+                            break
+                        name, entry = pending[0]
+                        if position < entry['offset']:
+                            # Bytes of unchanged entries between two changed ones
+                            skip = min(len(view), entry['offset'] - position)
+                            view = view[skip:]
+                            position += skip
+                            continue
+                        pending.pop(0)
+                        current = EntryWriter(name, entry, local_path(staging_dir, name))
+                        remaining = entry['compressed_size']
+                    size = min(len(view), remaining)
+                    current.write(view[:size])
+                    view = view[size:]
+                    position += size
+                    remaining -= size
+                    if not remaining:
+                        current.close()
+                        current = None
+                fetched += len(chunk)
+                if progress_callback:
+                    progress_callback(fetched, total)
+            if current is not None or pending:
+                if current is not None:
+                    current.file.close()
+                raise IOError("Connection closed before the update was complete")
+
+def apply_staged(app_dir, staging_dir, names, removed=()):
+    """Move staged files into app_dir.
+
+    Files in use (the running executable, loaded DLLs) cannot be overwritten on Windows but
+    can be renamed, so each replaced file is first moved aside to <name>.old. Those are
+    deleted by cleanup_old_files() on the next start.
+
+    If a move fails partway, the files already moved in are taken out again and the .old
+    files restored before the error is raised, so app_dir is left as it was.
+    """
+    moved_aside = []
+    moved_in = []
+    try:
+        for name in list(names) + list(removed):
+            target = local_path(app_dir, name)
+            if os.path.exists(target):
+                os.replace(target, target + OLD_SUFFIX)
+                moved_aside.append(target)
+        for name in names:
+            target = local_path(app_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(local_path(staging_dir, name), target)
+            moved_in.append(target)
+    except OSError:
+        rollback_staged(moved_in, moved_aside)
+        raise
+
+def rollback_staged(moved_in, moved_aside):
+    """Undo a partial apply_staged(): drop the new files and put the .old ones back"""
+    for target in moved_in:
+        if target not in moved_aside:
+            try:
+                os.remove(target)
+            except OSError as e:
+                print(f"Could not remove {target}: {e}")
+    for target in moved_aside:
+        try:
+            os.replace(target + OLD_SUFFIX, target)
+        except OSError as e:
+            print(f"Could not restore {target}: {e}")
+
+def record_installed(manifest, app_dir, removed=()):
+    """Save manifest as the installed one, with the mtimes that let changed_files() skip hashing"""
+    installed = dict(manifest, files={}, removed=list(removed))
+    for name, entry in manifest['files'].items():
+        try:
+            mtime = os.stat(local_path(app_dir, name)).st_mtime
+        except OSError:
+            continue
+        installed['files'][name] = dict(entry, mtime=mtime)
+    save_manifest(os.path.join(app_dir, MANIFEST_NAME), installed)
+
+def cleanup_old_files(app_dir):
+    """Delete files a previous update moved aside, once nothing holds them open anymore"""
+    installed = load_manifest(os.path.join(app_dir, MANIFEST_NAME))
+    if not installed:
+        return
+    for name in list(installed.get('files', {})) + installed.get('removed', []):
+        old_path = local_path(app_dir, name) + OLD_SUFFIX
+        try:
+            os.remove(old_path)
+        except OSError:
+            pass
@@ -0,0 +1,91 @@
+import re
+import json
+import subprocess
+import platform
+import tempfile
+from src.mduyt.core.engine import YoutubeDL, inprocess_available, ytdlp_sanitize_filename
+
+def sanitize_filename(title):
+    """title as yt-dlp itself would write %(playlist_title)s, so the folder is the one it uses"""
+    if ytdlp_sanitize_filename is not None:
+        return ytdlp_sanitize_filename(title, restricted=False) or "Playlist"
+    # Only when the yt_dlp module is not bundled; titles with these characters may then differ
+    title = re.sub(r'[\\/*?:"<>|]', "_", title)
+    title = ' '.join(title.split())
+    return title[:200].strip(' .') or "Playlist"
+
+def output_template_for(playlist_title):
+    """yt-dlp output template that keeps the %(playlist_title)s/%(title)s layout for a single item"""
+    folder = sanitize_filename(playlist_title).replace('%', '%%')
+    return f"{folder}/%(title)s.%(ext)s"
+
+def entry_url(entry):
+    url = entry.get('url') or entry.get('webpage_url')
+    if url and not url.startswith(('http://', 'https://')) and entry.get('ie_key') == 'Youtube':
+        url = f"https://www.youtube.com/watch?v={url}"
+    return url
+
+def iter_playlist(url, yt_dlp_binary=None):
+    """Yield (playlist_title, entry_url, playlist_count) as playlist pages are fetched.
+
+    Entries are flat-extracted, so the first ones are available long before a large
+    channel has been fully paged in. playlist_count is 0 while the size is unknown.
+    A URL that is not a playlist yields (None, url, 1) once.
+    """
+    if inprocess_available() and yt_dlp_binary is None:
+        yield from _iter_playlist_inprocess(url)
+    else:
+        yield from _iter_playlist_process(url, yt_dlp_binary)
+
+def _iter_playlist_inprocess(url):
+    params = {'extract_flat': 'in_playlist', 'lazy_playlist': True, 'quiet': True, 'no_warnings': True}
+    with YoutubeDL(params) as ydl:
+        # process=False keeps the entries as the extractor's lazy pager instead of resolving them
+        info = ydl.extract_info(url, download=False, process=False)
+        while info.get('_type') in ('url', 'url_transparent') and info.get('url') != url:
+            url = info['url']
+            info = ydl.extract_info(url, download=False, process=False, ie_key=info.get('ie_key'))
+
+        if info.get('_type') not in ('playlist', 'multi_video'):
+            yield None, url, 1
+            return
+
+        title = info.get('title') or info.get('id') or "Playlist"
+        count = info.get('playlist_count') or 0
+        for entry in info.get('entries') or []:
+            if entry and entry_url(entry):
+                yield title, entry_url(entry), count
+
+def _iter_playlist_process(url, yt_dlp_binary):
+    # stderr goes to a file so warnings can never fill a pipe while stdout is being streamed
+    stderr = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+    process = subprocess.Popen(
+        [yt_dlp_binary, '--flat-playlist', '--lazy-playlist', '--yes-playlist', '-j', url],
+        stdout=subprocess.PIPE, stderr=stderr, text=True, encoding='utf-8',
+        creationflags=subprocess.CREATE_NO_WINDOW if platform.system().lower() == 'windows' else 0
+    )
+    try:
+        found = False
+        for line in process.stdout:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            found = True
+            if not entry.get('playlist_id') and not entry.get('playlist_title'):
+                # yt-dlp prints the resolved video itself when the URL is not a playlist
+                yield None, url, 1
+                continue
+            if entry_url(entry):
+                yield (entry.get('playlist_title') or entry.get('playlist') or "Playlist",
+                       entry_url(entry), entry.get('playlist_count') or entry.get('n_entries') or 0)
+
+        process.wait()
+        if process.returncode != 0 and not found:
+            stderr.seek(0)
+            error = stderr.read().strip()
+            raise RuntimeError(error.splitlines()[-1] if error else f"yt-dlp exited with code {process.returncode}")
+    finally:
+        if process.poll() is None:
+            process.terminate()
+        stderr.close()
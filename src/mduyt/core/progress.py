@@ -0,0 +1,70 @@
+import json
+from collections import namedtuple
+
+PROGRESS_PREFIX = "[mdu-progress]"
+POSTPROCESS_PREFIX = "[mdu-postprocess]"
+
+# Passed to yt-dlp as --progress-template. Download updates arrive many times a second, so
+# they are plain values separated by tabs, missing ones printed as NA; splitting that is
+# cheaper than decoding JSON. Post-processor lines are rare and carry titles, they stay JSON.
+PROGRESS_FIELDS = ('progress.status', 'progress.downloaded_bytes', 'progress.total_bytes',
+                   'progress.total_bytes_estimate', 'progress.speed', 'progress.eta',
+                   'info.playlist_index', 'info.n_entries', 'info.playlist_count')
+PROGRESS_TEMPLATE = "download:" + PROGRESS_PREFIX + "\t".join(f"%({field})s" for field in PROGRESS_FIELDS)
+POSTPROCESS_TEMPLATE = (
+    "postprocess:" + POSTPROCESS_PREFIX
+    + "%(progress.{status,postprocessor})j"
+    + "\t%(info.{filepath,title,uploader})j"
+)
+NA = 'NA'
+
+ProgressRecord = namedtuple('ProgressRecord', [
+    'status', 'downloaded_bytes', 'total_bytes', 'speed', 'eta', 'playlist_index', 'playlist_count'
+])
+PostprocessRecord = namedtuple('PostprocessRecord', ['status', 'postprocessor', 'filepath', 'title', 'uploader'])
+
+def progress_template_args():
+    return ['--progress-template', PROGRESS_TEMPLATE, '--progress-template', POSTPROCESS_TEMPLATE]
+
+def record_percent(record):
+    if not record.total_bytes:
+        return 0.0
+    return min(record.downloaded_bytes / record.total_bytes * 100, 100.0)
+
+def _number(value):
+    try:
+        return None if value == NA else float(value)
+    except ValueError:
+        return None
+
+def parse_record(line):
+    """Parse a line printed through PROGRESS_TEMPLATE/POSTPROCESS_TEMPLATE, None for any other line"""
+    if line.startswith(PROGRESS_PREFIX):
+        fields = line[len(PROGRESS_PREFIX):].rstrip('\r\n').split('\t')
+        if len(fields) != len(PROGRESS_FIELDS):
+            return None
+        status, downloaded, total, estimate, speed, eta, index, n_entries, count = fields
+        return ProgressRecord(
+            status,
+            _number(downloaded) or 0,
+            _number(total) or _number(estimate),
+            _number(speed),
+            _number(eta),
+            int(_number(index) or 0),
+            int(_number(n_entries) or _number(count) or 1),
+        )
+    if not line.startswith(POSTPROCESS_PREFIX):
+        return None
+
+    progress, _, info = line[len(POSTPROCESS_PREFIX):].rstrip('\r\n').partition('\t')
+    try:
+        progress = json.loads(progress)
+    except ValueError:
+        return None
+    try:
+        info = json.loads(info) or {}
+    except ValueError:
+        # yt-dlp prints its NA placeholder for missing fields
+        info = {}
+    return PostprocessRecord(progress.get('status'), progress.get('postprocessor'), info.get('filepath'),
+                             info.get('title') or '', info.get('uploader') or '')
@@ -0,0 +1,62 @@
+import threading
+from PySide6.QtCore import QObject, QTimer, Signal
+
+class ProgressAggregator(QObject):
+    """Coalesces progress reports from worker threads into one batched signal per frame.
+
+    report() may be called from any thread and only stores the latest state per key;
+    progress_batch is emitted on the GUI thread at most once per interval with every
+    key that changed since the previous batch.
+    """
+    progress_batch = Signal(dict)
+    _wake = Signal()
+
+    def __init__(self, interval_ms=33, idle_ticks=30, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._dirty = set()
+        self._idle_ticks = idle_ticks
+        self._idle = 0
+        self._running = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._flush)
+        self._wake.connect(self._start)
+
+    def report(self, key, progress, file_size, download_speed, eta, current_item, total_items):
+        with self._lock:
+            self._latest[key] = (progress, file_size, download_speed, eta, current_item, total_items)
+            self._dirty.add(key)
+            wake = not self._running
+            self._running = True
+        if wake:
+            self._wake.emit()
+
+    def finish(self, key):
+        with self._lock:
+            self._latest.pop(key, None)
+            self._dirty.discard(key)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._latest)
+
+    def _start(self):
+        self._idle = 0
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            batch = {key: self._latest[key] for key in self._dirty}
+            self._dirty.clear()
+            if not batch:
+                self._idle += 1
+                # Stop ticking once nothing has been reported for a while
+                if self._idle >= self._idle_ticks:
+                    self._running = False
+                    self._timer.stop()
+                return
+            self._idle = 0
+        self.progress_batch.emit(batch)
@@ -0,0 +1,222 @@
+import re
+import time
+import errno
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Failure classes, from most to least worth retrying
+RATE_LIMITED = 'rate_limited'
+FORBIDDEN = 'forbidden'
+TIMEOUT = 'timeout'
+NETWORK = 'network'
+SERVER = 'server'
+EXTRACTOR = 'extractor'
+PERMANENT = 'permanent'
+
+HTTP_STATUS_RE = re.compile(r'HTTP Error (\d{3})|\b(\d{3}),? message=|status[ =:]+(\d{3})', re.IGNORECASE)
+RATE_LIMIT_RE = re.compile(r'too many requests|rate.?limit|sign in to confirm you.re not a bot', re.IGNORECASE)
+TIMEOUT_RE = re.compile(r'timed? ?out|timeout', re.IGNORECASE)
+NETWORK_RE = re.compile(r'connection (?:reset|refused|aborted|broken|closed)|remote end closed|server disconnected|'
+                        r'temporary failure in name resolution|failed to resolve|getaddrinfo failed|'
+                        r'failed to establish a new connection|network is unreachable|incomplete ?read|'
+                        r'payload is not completed', re.IGNORECASE)
+# yt-dlp extractor errors that usually go away on a later attempt
+TRANSIENT_EXTRACTOR_RE = re.compile(r'unable to (?:download|extract)|failed to parse json|got error: |'
+                                    r'the read operation timed out|fragment', re.IGNORECASE)
+PERMANENT_RE = re.compile(r'video unavailable|private video|unsupported url|is not a valid url|has been removed|'
+                          r'not available in your country|members.only|requested format is not available|'
+                          r'stopped by user', re.IGNORECASE)
+# Failures on this machine rather than the network: another attempt fails the same way
+LOCAL_RE = re.compile(r'no such file or directory|permission denied|access is denied|no space left on device|'
+                      r'disk quota exceeded|read-only file system|is a directory|not a directory|'
+                      r'exited with code -?\d+', re.IGNORECASE)
+LOCAL_ERRNOS = {errno.ENOENT, errno.EACCES, errno.EPERM, errno.ENOSPC, errno.EROFS, errno.EISDIR, errno.ENOTDIR,
+                errno.EEXIST, errno.EMFILE, errno.ENAMETOOLONG, getattr(errno, 'EDQUOT', errno.ENOSPC)}
+
+def host_of(url):
+    return (urlparse(url).hostname or url).lower()
+
+def status_class(status):
+    if status == 429:
+        return RATE_LIMITED
+    if status == 403:
+        return FORBIDDEN
+    if status in (408, 504):
+        return TIMEOUT
+    if status >= 500:
+        return SERVER
+    return PERMANENT
+
+def classify(error):
+    """Failure class of an exception or of a yt-dlp error message.
+
+    Anything not recognised as transient is PERMANENT, so a failure nobody anticipated
+    is reported instead of being retried with backoff.
+    """
+    status = getattr(error, 'status', None)
+    if isinstance(status, int) and status >= 400:
+        return status_class(status)
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return TIMEOUT
+    if isinstance(error, ConnectionError):
+        return NETWORK
+    if isinstance(error, OSError) and error.errno in LOCAL_ERRNOS:
+        return PERMANENT
+
+    message = str(error)
+    if PERMANENT_RE.search(message) or LOCAL_RE.search(message):
+        return PERMANENT
+    match = HTTP_STATUS_RE.search(message)
+    if match:
+        return status_class(int(next(group for group in match.groups() if group)))
+    if RATE_LIMIT_RE.search(message):
+        return RATE_LIMITED
+    if TIMEOUT_RE.search(message):
+        return TIMEOUT
+    if NETWORK_RE.search(message):
+        return NETWORK
+    if TRANSIENT_EXTRACTOR_RE.search(message):
+        return EXTRACTOR
+    return PERMANENT
+
+def retry_after(headers):
+    """Seconds from a Retry-After header (delta or HTTP date), None if absent or unreadable"""
+    value = headers.get('Retry-After') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RetryPolicy:
+    """How often and how long to back off for each failure class.
+
+    Delays grow exponentially from base_delay and use full jitter, so workers that failed
+    together do not come back together. Rate limiting starts from a longer delay.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, rate_limit_delay=10.0,
+                 retryable=(RATE_LIMITED, FORBIDDEN, TIMEOUT, NETWORK, SERVER, EXTRACTOR)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.retryable = retryable
+
+    def should_retry(self, failure, attempt):
+        return failure in self.retryable and attempt + 1 < self.max_attempts
+
+    def delay(self, failure, attempt, server_delay=None):
+        base = self.rate_limit_delay if failure == RATE_LIMITED else self.base_delay
+        delay = random.uniform(0, min(self.max_delay, base * 2 ** attempt))
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay * 5))
+        return delay
+
+# Segment requests are cheap to repeat; a yt-dlp job repeats its extraction, so it waits longer
+SEGMENT_POLICY = RetryPolicy(max_attempts=6, base_delay=0.5, max_delay=30.0)
+JOB_POLICY = RetryPolicy(max_attempts=4, base_delay=5.0, max_delay=300.0, rate_limit_delay=30.0,
+                         retryable=(RATE_LIMITED, TIMEOUT, NETWORK, SERVER, EXTRACTOR))
+
+class HostState:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+
+class HostRegistry:
+    """Per-host circuit breakers shared by every download in the process.
+
+    After threshold rate-limit or server failures in a row the host's circuit opens and
+    nobody contacts it until the cooldown has passed. Then one request is let through as
+    a probe: success closes the circuit, failure opens it again for twice as long.
+    """
+
+    def __init__(self, threshold=3, cooldown=15.0, max_cooldown=600.0, probe_timeout=60.0):
+        self.threshold = threshold
+        self.probe_timeout = probe_timeout
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        return self._hosts.setdefault(host, HostState())
+
+    def acquire(self, host):
+        """Seconds to wait before host may be contacted, 0 if the request can go ahead now"""
+        with self._lock:
+            state = self._state(host)
+            now = time.monotonic()
+            if state.open_until > now:
+                return state.open_until - now
+            if state.cooldown:
+                # Half open: one probe at a time until a request succeeds
+                if state.probing and now - state.probe_started < self.probe_timeout:
+                    return 1.0
+                state.probing = True
+                state.probe_started = now
+            return 0.0
+
+    def record_success(self, host):
+        with self._lock:
+            state = self._state(host)
+            state.failures = 0
+            state.cooldown = 0.0
+            state.open_until = 0.0
+            state.probing = False
+
+    def record_failure(self, host, failure, server_delay=None):
+        with self._lock:
+            state = self._state(host)
+            was_probe = state.probing
+            state.probing = False
+            if failure not in (RATE_LIMITED, SERVER):
+                return
+            state.failures += 1
+            if state.failures < self.threshold and not was_probe and server_delay is None:
+                return
+            state.cooldown = min(self.max_cooldown, state.cooldown * 2 if state.cooldown else self.base_cooldown)
+            cooldown = max(state.cooldown, server_delay or 0)
+            state.open_until = time.monotonic() + cooldown * random.uniform(1.0, 1.25)
+
+    def wait(self, host, should_stop=lambda: False):
+        """Block until host may be contacted, returns False if should_stop() became true"""
+        while True:
+            delay = self.acquire(host)
+            if not delay:
+                return True
+            if not sleep_unless(delay, should_stop):
+                return False
+
+    async def wait_async(self, host):
+        while True:
+            delay = self.acquire(host)
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+def sleep_unless(delay, should_stop):
+    """Sleep for delay seconds, waking early when should_stop() becomes true; False if it did"""
+    deadline = time.monotonic() + delay
+    while time.monotonic() < deadline:
+        if should_stop():
+            return False
+        time.sleep(min(0.2, max(0.0, deadline - time.monotonic())))
+    return not should_stop()
+
+_hosts = HostRegistry()
+
+def get_host_registry():
+    """Circuit breakers shared by every downloader in this process"""
+    return _hosts
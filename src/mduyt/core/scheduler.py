@@ -0,0 +1,286 @@
+import queue
+import threading
+import itertools
+from PySide6.QtCore import QObject, Signal, Qt
+from src.mduyt.core.downloader import Downloader
+from src.mduyt.core.engine import ENGINE_PROCESS, ENGINE_POOL, inprocess_available
+from src.mduyt.core.workerpool import get_worker_pool
+from src.mduyt.core.playlist import iter_playlist, output_template_for
+from src.mduyt.core.retry import JOB_POLICY, classify, get_host_registry, host_of, sleep_unless
+from src.mduyt.core.toolregistry import YT_DLP, get_tool_registry
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class DownloadJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, url, options, engine=None):
+        self.id = next(self._ids)
+        self.url = url
+        self.options = options
+        # None runs it on the scheduler's engine
+        self.engine = engine
+        self.state = QUEUED
+        self.error = None
+        self.files = []
+        # {file path: {algorithm: hexdigest}}, computed while the file was written
+        self.digests = {}
+        self.downloader = None
+        self.cancelled = False
+
+    def is_active(self):
+        return self.state in (QUEUED, RUNNING)
+
+class SchedulerSignals(QObject):
+    job_added = Signal(int, str)
+    job_state_changed = Signal(int, str, str)
+    job_progress = Signal(int, float, str, str, str, int, int)
+    job_file_downloaded = Signal(int, str, str, str, str, str)
+    queue_finished = Signal(int, int, int)
+    playlist_started = Signal(str, str)
+    playlist_enumerated = Signal(str, str, int)
+    playlist_error = Signal(str, str)
+
+class DownloadScheduler:
+    """Bounded worker pool driving Downloader.download for queued jobs"""
+
+    def __init__(self, max_workers=3, engine=None, progress_reporter=None):
+        self.max_workers = max(1, max_workers)
+        # Optional ProgressAggregator; when set, progress bypasses job_progress entirely
+        self.progress_reporter = progress_reporter
+        # Batches are mostly short clips, so skip the per-job yt-dlp startup when the module is bundled
+        if engine is None:
+            engine = ENGINE_POOL if inprocess_available() else ENGINE_PROCESS
+        self.engine = engine
+        self.signals = SchedulerSignals()
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._finished_reported = True
+        self._generation = 0
+
+    def set_max_workers(self, max_workers):
+        with self._lock:
+            self.max_workers = max(1, max_workers)
+        if self.engine == ENGINE_POOL:
+            get_worker_pool(self.max_workers)
+        self._ensure_workers()
+
+    def submit(self, url, **options):
+        job = DownloadJob(url, options)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._finished_reported = False
+        self.signals.job_added.emit(job.id, url)
+        self._queue.put(job.id)
+        if self.engine == ENGINE_POOL:
+            get_worker_pool(self.max_workers)
+        self._ensure_workers()
+        return job
+
+    def start(self, url, engine=None, **options):
+        """Run a job right away on a thread of its own, ahead of the queue and outside max_workers"""
+        job = DownloadJob(url, options, engine)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._finished_reported = False
+        self.signals.job_added.emit(job.id, url)
+        threading.Thread(target=self._run_alone, args=(job,), daemon=True).start()
+        return job
+
+    def submit_many(self, urls, **options):
+        return [self.submit(url, **options) for url in urls]
+
+    def submit_playlist(self, url, **options):
+        """Enumerate a playlist in the background and queue each entry as its own job"""
+        threading.Thread(target=self._fan_out_playlist, args=(url, options), daemon=True).start()
+
+    def _fan_out_playlist(self, url, options):
+        generation = self._generation
+        options = dict(options, is_playlist=False)
+        title = None
+        count = 0
+        try:
+            binary = None if self.engine == ENGINE_POOL else get_tool_registry().path(YT_DLP)
+            entries = iter_playlist(url, binary)
+            # Entries are queued as soon as each page arrives, the first downloads start
+            # while the rest of the playlist is still being enumerated.
+            for title, entry_url, playlist_count in entries:
+                if generation != self._generation:
+                    entries.close()
+                    break
+                count += 1
+                if title is None:
+                    self.submit(entry_url, **options)
+                    continue
+                if count == 1:
+                    self.signals.playlist_started.emit(url, title)
+                self.submit(entry_url, output_template=output_template_for(title), playlist_title=title,
+                            playlist_index=count, playlist_count=playlist_count, **options)
+        except Exception as e:
+            self.signals.playlist_error.emit(url, str(e))
+            return
+        self.signals.playlist_enumerated.emit(url, title or "", count)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or not job.is_active():
+                return False
+            job.cancelled = True
+            downloader = job.downloader
+            was_queued = job.state == QUEUED
+        if was_queued:
+            self._set_state(job, CANCELLED)
+        elif downloader:
+            downloader.stop()
+        return True
+
+    def cancel_all(self):
+        # Stops playlists that are still being enumerated from queueing more entries
+        self._generation += 1
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def counts(self):
+        with self._lock:
+            states = [job.state for job in self.jobs.values()]
+        return {state: states.count(state) for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+
+    def has_active_jobs(self):
+        with self._lock:
+            return any(job.is_active() for job in self.jobs.values())
+
+    def clear_finished(self):
+        with self._lock:
+            self.jobs = {job_id: job for job_id, job in self.jobs.items() if job.is_active()}
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            missing = min(self.max_workers - len(self._workers), self._queue.qsize())
+            for _ in range(missing):
+                worker = threading.Thread(target=self._worker_loop, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+    def _worker_loop(self):
+        while True:
+            with self._lock:
+                if len(self._workers) > self.max_workers:
+                    self._workers.remove(threading.current_thread())
+                    return
+            try:
+                job_id = self._queue.get(timeout=1)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._workers.remove(threading.current_thread())
+                        return
+                continue
+
+            job = self.jobs.get(job_id)
+            if job is not None and not job.cancelled:
+                self._run_job(job)
+            self._queue.task_done()
+            self._check_queue_finished()
+
+    def _run_alone(self, job):
+        self._run_job(job)
+        self._check_queue_finished()
+
+    def _run_job(self, job):
+        downloader = Downloader(job.engine or self.engine)
+        # Direct connections keep the relay on this worker thread; the
+        # scheduler signals are then queued to the GUI thread by Qt.
+        options = job.options
+        if 'playlist_index' in options:
+            # Fanned-out playlist entries report their position in the original playlist
+            position = (options['playlist_index'], options['playlist_count'])
+            relay_args = lambda args: args[:4] + position
+        else:
+            relay_args = lambda args: args
+        if self.progress_reporter is not None:
+            downloader.signals.progress.connect(
+                lambda *args: self.progress_reporter.report(job.id, *relay_args(args)), Qt.DirectConnection)
+        else:
+            downloader.signals.progress.connect(
+                lambda *args: self.signals.job_progress.emit(job.id, *relay_args(args)), Qt.DirectConnection)
+        downloader.signals.file_downloaded.connect(
+            lambda *args: self._on_file_downloaded(job, *args),
+            Qt.DirectConnection)
+        downloader.signals.error.connect(
+            lambda message: setattr(job, 'error', message), Qt.DirectConnection)
+
+        with self._lock:
+            if job.cancelled:
+                return
+            # Together with the downloader, so cancel() either sees QUEUED or has a downloader to stop
+            job.downloader = downloader
+            job.state = RUNNING
+        self.signals.job_state_changed.emit(job.id, RUNNING, "")
+
+        ok = self._download_with_retries(job, downloader)
+
+        with self._lock:
+            job.downloader = None
+        job.digests.update(downloader.digests)
+        if self.progress_reporter is not None:
+            self.progress_reporter.finish(job.id)
+        if job.cancelled:
+            self._set_state(job, CANCELLED)
+        elif ok:
+            self._set_state(job, DONE)
+        else:
+            self._set_state(job, FAILED, job.error or "Unknown error")
+
+    def _download_with_retries(self, job, downloader, policy=JOB_POLICY):
+        """Run the download, retrying transient failures with per-host backoff"""
+        options = job.options
+        host = host_of(job.url)
+        hosts = get_host_registry()
+        attempt = 0
+        while hosts.wait(host, lambda: job.cancelled):
+            if job.cancelled:
+                return False
+            job.error = None
+            ok = downloader.download(job.url, options.get('is_audio', False), options.get('audio_format'),
+                                     options.get('resolution'), options.get('fps'), options['download_dir'],
+                                     options.get('is_playlist', False), options.get('with_thumbnail', False),
+                                     options.get('output_template'))
+            if ok:
+                hosts.record_success(host)
+                return True
+            if job.cancelled:
+                return False
+            failure = classify(job.error or "")
+            hosts.record_failure(host, failure)
+            if not policy.should_retry(failure, attempt):
+                return False
+            delay = policy.delay(failure, attempt)
+            self._set_state(job, RUNNING, f"Retrying in {delay:.0f}s ({failure}): {job.error}")
+            if not sleep_unless(delay, lambda: job.cancelled):
+                return False
+            attempt += 1
+        return False
+
+    def _on_file_downloaded(self, job, filename, path, file_type, title, uploader):
+        job.files.append((filename, path, file_type))
+        self.signals.job_file_downloaded.emit(job.id, filename, path, file_type, title, uploader)
+
+    def _set_state(self, job, state, message=""):
+        job.state = state
+        self.signals.job_state_changed.emit(job.id, state, message)
+
+    def _check_queue_finished(self):
+        with self._lock:
+            if self._finished_reported or any(job.is_active() for job in self.jobs.values()):
+                return
+            self._finished_reported = True
+            states = [job.state for job in self.jobs.values()]
+        self.signals.queue_finished.emit(states.count(DONE), states.count(FAILED), states.count(CANCELLED))
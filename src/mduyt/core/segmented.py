@@ -0,0 +1,636 @@
+import os
+import ssl
+import time
+import json
+import errno
+import shutil
+import asyncio
+import bisect
+import logging
+from collections import deque
+from urllib.parse import urlparse
+from src.mduyt.utils.format import format_bytes
+from src.mduyt.core.retry import NETWORK, SEGMENT_POLICY, classify, get_host_registry, host_of, retry_after
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+log = logging.getLogger(__name__)
+
+# Ranges smaller than this are not split further when connections steal work
+MIN_SPLIT_SIZE = 1024 * 1024
+
+# Block size used when preallocating by writing zeros
+ZERO_FILL_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Journal kept next to a download in progress so an interrupted one can be resumed
+JOURNAL_SUFFIX = ".mdu-journal"
+JOURNAL_VERSION = 1
+# Bytes are written here and renamed to the final name once complete. Not yt-dlp's ".part":
+# it would take a preallocated file for one it can append to.
+PART_SUFFIX = ".mdu.part"
+
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.mov', '.avi', '.m4a', '.mp3', '.flac', '.wav', '.ogg', '.opus', '.aac')
+
+class DownloadStopped(Exception):
+    pass
+
+class RemoteFileChanged(Exception):
+    pass
+
+def segmented_available():
+    return aiohttp is not None
+
+def is_direct_media_url(url):
+    """True for plain http(s) links straight to a media file, which need no extractor"""
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and parsed.path.lower().endswith(MEDIA_EXTENSIONS)
+
+def make_session(connection_limit=100, limit_per_host=0):
+    """Pooled session; keep-alive connections, TLS sessions and DNS answers are reused between requests"""
+    connector = aiohttp.TCPConnector(limit=connection_limit, limit_per_host=limit_per_host, ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector)
+
+def make_ssl_context(check_certificate='auto'):
+    ssl_context = ssl.create_default_context()
+    if check_certificate == 'no':
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+    return ssl_context
+
+class ProgressTracker:
+    """Sums bytes from every connection and reports (downloaded, total, speed) to a callback"""
+
+    def __init__(self, total, callback=None, should_stop=None, interval=0.1, downloaded=0):
+        self.total = total
+        self.downloaded = downloaded
+        self.speed = None
+        self.callback = callback
+        self.should_stop = should_stop
+        self.interval = interval
+        self._last_time = time.monotonic()
+        self._last_bytes = downloaded
+
+    def advance(self, size):
+        if self.should_stop and self.should_stop():
+            raise DownloadStopped("Download stopped by user")
+        self.downloaded += size
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if elapsed >= self.interval:
+            current = (self.downloaded - self._last_bytes) / elapsed
+            # Exponential moving average keeps the displayed speed steady
+            self.speed = current if self.speed is None else self.speed * 0.7 + current * 0.3
+            self._last_time = now
+            self._last_bytes = self.downloaded
+            self.report()
+
+    def report(self):
+        if self.callback:
+            self.callback(self.downloaded, self.total, self.speed)
+
+def check_free_space(directory, required):
+    """Raise ENOSPC up front instead of failing halfway through a large download"""
+    free = shutil.disk_usage(directory).free
+    if required > free:
+        raise OSError(errno.ENOSPC, f"Not enough disk space: {format_bytes(required)} needed, "
+                                    f"{format_bytes(free)} free in {directory}")
+
+def zero_fill(fd, start, end):
+    block = bytes(ZERO_FILL_BLOCK_SIZE)
+    position = start
+    while position < end:
+        size = min(len(block), end - position)
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, block[:size], position)
+        else:
+            os.lseek(fd, position, os.SEEK_SET)
+            written = os.write(fd, block[:size])
+        position += written
+
+def allocate_file(fd, file_size, file_allocation):
+    """Reserve file_size bytes for fd.
+
+    falloc asks the filesystem for the extents with posix_fallocate and falls back to
+    prealloc where that is unavailable (Windows, macOS) or unsupported by the filesystem.
+    prealloc writes zeros over everything past the current end of the file, so existing
+    data of a resumed download is kept. none leaves the file to grow, sparse, as ranges land.
+    """
+    if file_allocation == 'none':
+        return
+    current_size = os.fstat(fd).st_size
+    if file_allocation == 'falloc':
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, file_size)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+                    raise
+                log.debug(f"posix_fallocate not supported here ({e}), writing zeros instead")
+        elif os.name == 'nt':
+            # Extending with SetEndOfFile allocates clusters on NTFS unless the file is marked sparse
+            if current_size < file_size:
+                os.ftruncate(fd, file_size)
+            return
+    if current_size < file_size:
+        zero_fill(fd, current_size, file_size)
+
+class OutputFile:
+    """Output file that segments write into at their own offsets, no per-segment part files"""
+
+    def __init__(self, filename, file_size, file_allocation='prealloc', resume=False, hasher=None):
+        self.filename = filename
+        self.file_size = file_size
+        self.hasher = hasher
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if not resume:
+            flags |= os.O_TRUNC
+        self.fd = os.open(filename, flags, 0o644)
+        try:
+            allocate_file(self.fd, file_size, file_allocation)
+        except BaseException:
+            os.close(self.fd)
+            self.fd = None
+            raise
+        if hasher is not None:
+            hasher.attach(self.fd)
+
+    def write_at(self, offset, data):
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                # Windows has no pwrite; connections share one event loop thread, so seek+write cannot interleave
+                os.lseek(self.fd, offset, os.SEEK_SET)
+                written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+        if self.hasher is not None:
+            self.hasher.update_at(offset - len(data), data)
+
+    def sync(self):
+        os.fsync(self.fd)
+
+    def close(self):
+        if self.fd is not None:
+            os.ftruncate(self.fd, self.file_size)
+            os.close(self.fd)
+            self.fd = None
+
+class DownloadJournal:
+    """Persistent record of a download in progress: its source, the server's validators
+    and the byte ranges already written to the output file.
+
+    Written bytes are kept as merged [start, end) intervals. The journal is checkpointed
+    while the download runs, after the output has been synced, so the ranges it lists
+    are always on disk even if the process is killed.
+    """
+
+    def __init__(self, path, url, file_size, etag=None, last_modified=None,
+                 save_every=16 * 1024 * 1024, save_interval=5.0):
+        self.path = path
+        self.url = url
+        self.file_size = file_size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.intervals = []
+        self.output = None
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+        self._saving = False
+        # The checkpoint still running on a worker thread, if any
+        self._pending = None
+
+    @classmethod
+    def load(cls, path):
+        """Read the journal at path, None if there is none or it cannot be used"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != JOURNAL_VERSION:
+                return None
+            journal = cls(path, data['url'], data['size'], data.get('etag'), data.get('last_modified'))
+            for start, end in data.get('completed', []):
+                journal._merge(start, end)
+            return journal
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches(self, file_size, etag, last_modified):
+        """True if the remote file is still the one the journal's ranges were taken from"""
+        if self.file_size != file_size:
+            return False
+        # Signed media URLs change on every extraction, so the validators decide, not the URL
+        if self.etag or etag:
+            return self.etag == etag
+        if self.last_modified or last_modified:
+            return self.last_modified == last_modified
+        return True
+
+    @property
+    def completed_bytes(self):
+        return sum(end - start for start, end in self.intervals)
+
+    def missing(self):
+        """Byte ranges still to be downloaded, as [start, end) pairs"""
+        gaps = []
+        position = 0
+        for start, end in self.intervals:
+            if start > position:
+                gaps.append((position, start))
+            position = max(position, end)
+        if position < self.file_size:
+            gaps.append((position, self.file_size))
+        return gaps
+
+    def _merge(self, start, end):
+        starts = [interval[0] for interval in self.intervals]
+        i = bisect.bisect_left(starts, start)
+        if i > 0 and self.intervals[i - 1][1] >= start:
+            i -= 1
+        j = i
+        while j < len(self.intervals) and self.intervals[j][0] <= end:
+            start = min(start, self.intervals[j][0])
+            end = max(end, self.intervals[j][1])
+            j += 1
+        self.intervals[i:j] = [(start, end)]
+
+    def mark(self, start, end):
+        """Record [start, end) as written, returns True when a checkpoint is due"""
+        self._merge(start, end)
+        self._unsaved += end - start
+        return not self._saving and (self._unsaved >= self.save_every
+                                     or time.monotonic() - self._last_save >= self.save_interval)
+
+    def save(self, intervals=None):
+        """Checkpoint intervals (all of them if None), after syncing the output"""
+        if intervals is None:
+            intervals = self.intervals
+            self._unsaved = 0
+        if self.output is not None:
+            # Data first, so the journal never lists bytes that only exist in the page cache
+            self.output.sync()
+        data = {'version': JOURNAL_VERSION, 'url': self.url, 'size': self.file_size, 'etag': self.etag,
+                'last_modified': self.last_modified, 'completed': intervals}
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, self.path)
+        self._last_save = time.monotonic()
+
+    async def checkpoint(self):
+        """save() on a worker thread, so the fsync never stalls the other transfers on the loop"""
+        self._saving = True
+        # Snapshot before the fsync starts: everything it lists has been written by then
+        intervals = list(self.intervals)
+        self._unsaved = 0
+        self._pending = asyncio.ensure_future(asyncio.to_thread(self.save, intervals))
+        # Cleared when the thread is done, not when a cancelled segment stops waiting for it
+        self._pending.add_done_callback(lambda _: setattr(self, '_saving', False))
+        await asyncio.shield(self._pending)
+
+    async def settle(self):
+        """Wait for a checkpoint still running on its thread, before saving, removing or closing the output"""
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        try:
+            await pending
+        except Exception as e:
+            # The final save() that follows writes the same ranges and more
+            log.warning(f"Journal checkpoint failed: {e}")
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class Segment:
+    """A byte range of the output file, end is inclusive and may shrink when another connection steals from it"""
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.position = start
+
+    @property
+    def remaining(self):
+        return self.end - self.position + 1
+
+class RangeScheduler:
+    """Hands byte ranges to connections.
+
+    The bytes still missing (the whole file unless resuming) start out cut into about
+    split_file ranges. Once those are all taken, a connection that runs out of work
+    splits the largest remaining range of a busy peer and takes its second half, so a
+    slow connection never holds up the file.
+    """
+
+    def __init__(self, file_size, split_file, min_split_size=MIN_SPLIT_SIZE, missing=None):
+        self.min_split_size = min_split_size
+        self.segments = []
+        self.pending = deque()
+        self.active = set()
+        if missing is None:
+            missing = [(0, file_size)]
+        total = sum(end - start for start, end in missing)
+        chunk_size = max(1, -(-total // split_file))
+        for start, end in missing:
+            while start < end:
+                stop = min(end, start + chunk_size)
+                self.pending.append(self._add(start, stop - 1))
+                start = stop
+
+    def _add(self, start, end):
+        segment = Segment(len(self.segments), start, end)
+        self.segments.append(segment)
+        return segment
+
+    def _victim(self):
+        candidates = [segment for segment in self.active if segment.remaining >= 2 * self.min_split_size]
+        return max(candidates, key=lambda segment: segment.remaining, default=None)
+
+    def has_work(self):
+        return bool(self.pending) or self._victim() is not None
+
+    def next_segment(self):
+        if self.pending:
+            segment = self.pending.popleft()
+        else:
+            victim = self._victim()
+            if victim is None:
+                return None
+            split = victim.position + victim.remaining // 2
+            segment = self._add(split, victim.end)
+            victim.end = split - 1
+            log.debug(f"Segment {segment.index} split from segment {victim.index} at byte {split}")
+        self.active.add(segment)
+        return segment
+
+    def finish(self, segment):
+        self.active.discard(segment)
+
+async def download_segment(session, url, segment, output, journal, tracker, headers=None, ssl_context=None,
+                           policy=SEGMENT_POLICY):
+    host = host_of(url)
+    hosts = get_host_registry()
+    attempt = 0
+
+    while segment.remaining > 0:
+        # Waits here while the host's circuit is open, so connections stop hammering a rate-limiting server
+        await hosts.wait_async(host)
+        # Retries resume from the last byte written instead of starting the range over
+        start_position = segment.position
+        request_headers = dict(headers or {}, Range=f'bytes={segment.position}-{segment.end}')
+        validator = journal.etag if journal.etag and not journal.etag.startswith('W/') else journal.last_modified
+        if validator:
+            # The server answers 200 with the whole body instead of mixing in bytes of a changed file
+            request_headers['If-Range'] = validator
+        try:
+            async with session.get(url, headers=request_headers, ssl=ssl_context) as response:
+                response.raise_for_status()
+                if response.status != 206:
+                    if validator:
+                        raise RemoteFileChanged("Remote file changed or server ignored the range request")
+                    raise IOError("Server ignored the range request")
+                async for chunk in response.content.iter_chunked(65536):
+                    # The range may have been shortened by a stealing connection meanwhile
+                    chunk = chunk[:segment.remaining]
+                    output.write_at(segment.position, chunk)
+                    checkpoint_due = journal.mark(segment.position, segment.position + len(chunk))
+                    segment.position += len(chunk)
+                    tracker.advance(len(chunk))
+                    if checkpoint_due:
+                        await journal.checkpoint()
+                    if segment.remaining <= 0:
+                        break
+            if segment.remaining > 0:
+                raise IOError(f"Connection closed with {segment.remaining} bytes left")
+            hosts.record_success(host)
+            log.info(f"Segment {segment.index} downloaded successfully")
+            return
+        except (DownloadStopped, RemoteFileChanged):
+            raise
+        except Exception as e:
+            if aiohttp is not None and isinstance(e, aiohttp.ClientError) and not getattr(e, 'status', None):
+                # Dropped connections and cut-off bodies; aiohttp's types are not ConnectionError
+                failure = NETWORK
+            else:
+                failure = classify(e)
+            server_delay = retry_after(getattr(e, 'headers', None))
+            hosts.record_failure(host, failure, server_delay)
+            if segment.position > start_position:
+                # Only failures that made no progress count towards giving up
+                attempt = 0
+            if not policy.should_retry(failure, attempt):
+                log.error(f"Failed to download segment {segment.index} after {attempt + 1} attempts ({failure}): {str(e)}")
+                raise
+            delay = policy.delay(failure, attempt, server_delay)
+            log.warning(f"Error downloading segment {segment.index} ({failure}): {str(e)}. "
+                        f"Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+async def run_connections(session, url, ranges, output, journal, tracker, num_connections, max_connections,
+                          headers=None, ssl_context=None, sample_interval=1.0):
+    """Run num_connections connections over ranges, adding more up to max_connections while throughput improves"""
+    async def connection():
+        while True:
+            segment = ranges.next_segment()
+            if segment is None:
+                return
+            await download_segment(session, url, segment, output, journal, tracker, headers, ssl_context)
+            ranges.finish(segment)
+
+    workers = set()
+    for _ in range(max(1, num_connections)):
+        workers.add(asyncio.create_task(connection()))
+
+    best_throughput = 0
+    last_bytes = tracker.downloaded
+    last_time = time.monotonic()
+    try:
+        while workers:
+            done, _ = await asyncio.wait(workers, timeout=sample_interval, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                workers.discard(task)
+                task.result()
+
+            now = time.monotonic()
+            throughput = (tracker.downloaded - last_bytes) / max(now - last_time, 1e-6)
+            last_bytes, last_time = tracker.downloaded, now
+            # Keep adding connections for as long as each one still buys at least 10% more throughput
+            if workers and len(workers) < max_connections and ranges.has_work() and throughput > best_throughput * 1.1:
+                best_throughput = throughput
+                workers.add(asyncio.create_task(connection()))
+                log.debug(f"Throughput {throughput:.0f} B/s, using {len(workers)} connections")
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        raise
+
+async def parallel_download(url, num_connections=16, split_file=16, file_allocation='prealloc', check_certificate='auto',
+                            output_directory=None, output_filename=None, headers=None, progress_callback=None,
+                            should_stop=None, max_connections=None, session=None, hasher=None):
+    """Download url over several ranged connections, returns the path of the finished file.
+
+    Starts with num_connections connections and adds more, up to max_connections, while
+    that still raises throughput. progress_callback(downloaded, total, speed) is called
+    while bytes arrive, total is 0 when the server does not report a size.
+
+    Data goes to <name>.mdu.part, renamed to the final name only once every range is
+    written, so an interrupted download never leaves a complete-looking file behind. It
+    leaves its journal next to it; calling this again for the same file only fetches the
+    ranges that are still missing, as long as the server reports the same size and validators.
+
+    Pass session to share one connection pool between several downloads; otherwise a
+    session is opened for this download and closed afterwards. A DownloadHasher passed
+    as hasher is fed every byte as it is written and holds the digests afterwards.
+    """
+    max_connections = max(num_connections, max_connections or num_connections)
+    if output_directory:
+        download_dir = os.path.abspath(output_directory)
+    else:
+        download_dir = os.path.expanduser("~/Downloads")
+    os.makedirs(download_dir, exist_ok=True)
+
+    log.info(f"Starting download from {url}")
+    log.debug(f"Using {num_connections} connections")
+    log.debug(f"Splitting file into {split_file} parts")
+    log.debug(f"File allocation method: {file_allocation}")
+    log.debug(f"Certificate check: {check_certificate}")
+    log.debug(f"Download directory: {download_dir}")
+
+    ssl_context = make_ssl_context(check_certificate)
+
+    own_session = session is None
+    if own_session:
+        session = make_session()
+    try:
+        async with session.head(url, headers=headers, ssl=ssl_context, allow_redirects=True) as response:
+            file_size = int(response.headers.get('Content-Length', 0))
+            accepts_ranges = response.headers.get('Accept-Ranges', 'bytes') != 'none'
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+        if not output_filename:
+            output_filename = os.path.basename(urlparse(url).path)
+            if not output_filename:
+                output_filename = 'downloaded_file'
+
+        filename = os.path.join(download_dir, output_filename)
+        part_path = filename + PART_SUFFIX
+        log.info(f"Output filename: {filename}")
+
+        if file_size == 0 or not accepts_ranges:
+            log.warning("Unable to determine file size. Downloading as a single file.")
+            tracker = ProgressTracker(file_size, progress_callback, should_stop)
+            async with session.get(url, headers=headers, ssl=ssl_context) as response:
+                response.raise_for_status()
+                with open(part_path, "wb") as f:
+                    async for chunk in response.content.iter_chunked(8192):
+                        f.write(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                        tracker.advance(len(chunk))
+            os.replace(part_path, filename)
+            if hasher is not None:
+                hasher.finish()
+            tracker.report()
+            log.info(f"Download completed: {filename}")
+            return filename
+
+        # Ranges below MIN_SPLIT_SIZE cost a request each for nothing, a small file is one range
+        split_file = max(1, min(split_file, file_size // MIN_SPLIT_SIZE))
+
+        log.debug(f"File size: {file_size} bytes")
+
+        journal_path = filename + JOURNAL_SUFFIX
+        journal = DownloadJournal.load(journal_path)
+        resume = (journal is not None and os.path.exists(part_path)
+                  and journal.matches(file_size, etag, last_modified))
+        if resume:
+            log.info(f"Resuming download, {journal.completed_bytes} of {file_size} bytes already on disk")
+            journal.url = url
+        else:
+            journal = DownloadJournal(journal_path, url, file_size, etag, last_modified)
+
+        tracker = ProgressTracker(file_size, progress_callback, should_stop, downloaded=journal.completed_bytes)
+        ranges = RangeScheduler(file_size, split_file, missing=journal.missing())
+        existing = os.path.getsize(part_path) if resume else 0
+        check_free_space(download_dir, file_size - min(existing, file_size))
+        # Segments land directly at their offsets, there is no combine pass afterwards
+        # Preallocation can zero-fill gigabytes; keep it off the loop other downloads share
+        output = await asyncio.to_thread(OutputFile, part_path, file_size, file_allocation, resume, hasher)
+        try:
+            journal.output = output
+            await journal.checkpoint()
+            if hasher is not None and resume:
+                hasher.add_existing(journal.intervals)
+            await run_connections(session, url, ranges, output, journal, tracker, num_connections, max_connections,
+                                  headers, ssl_context)
+            if hasher is not None:
+                hasher.finish(file_size)
+        except RemoteFileChanged:
+            # The bytes on disk belong to an older version of the file, start over next time
+            await journal.settle()
+            journal.output = None
+            journal.remove()
+            raise
+        except BaseException:
+            # Both write the journal's .tmp file, and the checkpoint may still be syncing the output
+            await journal.settle()
+            journal.save()
+            raise
+        finally:
+            await journal.settle()
+            output.close()
+        tracker.report()
+        os.replace(part_path, filename)
+        journal.remove()
+    finally:
+        if own_session:
+            await session.close()
+
+    log.info(f"Download completed: {filename}")
+    return filename
+
+async def download_multiple(urls, num_connections, split_file, file_allocation, check_certificate, output_directory,
+                            max_connections=None, concurrent_downloads=4, connection_limit=64, limit_per_host=16,
+                            progress_factory=None):
+    """Download urls over one pooled session, concurrent_downloads files at a time.
+
+    connection_limit caps the connections of the whole batch and limit_per_host those to
+    any one host. progress_factory(url), if given, returns the progress_callback for that
+    url. Returns {url: path of the finished file, or None if it failed}.
+    """
+    results = dict.fromkeys(urls)
+    semaphore = asyncio.Semaphore(max(1, concurrent_downloads))
+
+    async def download(session, url):
+        async with semaphore:
+            progress_callback = progress_factory(url) if progress_factory else None
+            try:
+                results[url] = await parallel_download(url, num_connections, split_file, file_allocation,
+                                                       check_certificate, output_directory,
+                                                       progress_callback=progress_callback,
+                                                       max_connections=max_connections, session=session)
+            except Exception as e:
+                log.exception(f"Error occurred: {str(e)}")
+
+    async with make_session(connection_limit, limit_per_host) as session:
+        await asyncio.gather(*(download(session, url) for url in results))
+    return results
+
+def download_segmented(url, output_directory, output_filename=None, headers=None, connections=8,
+                       progress_callback=None, should_stop=None, max_connections=16, hasher=None):
+    """Blocking wrapper around parallel_download for worker threads"""
+    return asyncio.run(parallel_download(url, connections, connections, 'falloc', 'auto', output_directory,
+                                         output_filename, headers, progress_callback, should_stop,
+                                         max_connections=max_connections, hasher=hasher))
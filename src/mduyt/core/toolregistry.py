@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import shutil
+import platform
+import threading
+import subprocess
+from env import root
+from src.mduyt.utils.paths import user_cache_dir
+
+YT_DLP = 'yt-dlp'
+FFMPEG = 'ffmpeg'
+FFPROBE = 'ffprobe'
+TOOLS = (YT_DLP, FFMPEG, FFPROBE)
+
+CACHE_VERSION = 1
+PROBE_TIMEOUT = 30
+
+def default_cache_path():
+    return os.path.join(user_cache_dir(), 'tools.json')
+
+def bundled_dir(system, rootpath):
+    """Where the binaries shipped with the app live on this platform"""
+    if system == 'windows':
+        return os.path.join(rootpath, 'bin', 'win')
+    elif system == 'darwin':
+        if getattr(sys, 'frozen', False):
+            # Inside the bundled .app, next to the Frameworks directory
+            return os.path.abspath(os.path.join(rootpath, '..', 'Frameworks', 'bin', 'mac'))
+        return os.path.join(rootpath, 'bin', 'mac')
+    elif system.startswith('linux'):
+        return os.path.join(rootpath, 'bin', 'linux')
+    raise OSError(f"Unsupported operating system: {system}")
+
+def run_quiet(args):
+    return subprocess.run(args, capture_output=True, text=True, timeout=PROBE_TIMEOUT,
+                          creationflags=subprocess.CREATE_NO_WINDOW if sys.platform == 'win32' else 0)
+
+def probe_version(name, path):
+    if name == YT_DLP:
+        return run_quiet([path, '--version']).stdout.strip() or None
+    # "ffmpeg version 7.1-full_build-www.gyan.dev Copyright ..."
+    first_line = run_quiet([path, '-version']).stdout.split('\n', 1)[0].split()
+    return first_line[2] if len(first_line) > 2 and first_line[1] == 'version' else None
+
+def probe_capabilities(name, path):
+    if name != FFMPEG:
+        return {}
+    encoders = []
+    listing = False
+    for line in run_quiet([path, '-hide_banner', '-encoders']).stdout.splitlines():
+        if line.strip().startswith('------'):
+            listing = True
+        elif listing and line.strip():
+            # " V....D libx264   libx264 H.264 / AVC ..."
+            parts = line.split()
+            if len(parts) > 1:
+                encoders.append(parts[1])
+    return {'encoders': encoders}
+
+class ToolRegistry:
+    """Locations, versions and capabilities of yt-dlp, ffmpeg and ffprobe.
+
+    Paths are resolved once per process without starting anything. Versions and
+    capabilities are probed on first use and kept in a JSON cache keyed by the binary's
+    path, size and mtime, so they are only probed again after the binary changes.
+    Nothing is installed: a tool that cannot be found keeps its bundled path and no version.
+    """
+
+    def __init__(self, rootpath=root, system=None, cache_path=None):
+        self.system = system or platform.system().lower()
+        self.workdir = bundled_dir(self.system, rootpath)
+        self.cache_path = cache_path or default_cache_path()
+        self._lock = threading.Lock()
+        self._paths = {}
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return cache.get('tools', {}) if cache.get('version') == CACHE_VERSION else {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            temp_path = self.cache_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'tools': self._entries}, f, indent=1)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save tool cache: {e}")
+
+    def path(self, name):
+        """Binary to run for a tool; the bundled one, or on Linux the one on PATH first"""
+        with self._lock:
+            if name not in self._paths:
+                self._paths[name] = self._locate(name)
+            return self._paths[name]
+
+    def _locate(self, name):
+        binary = name + '.exe' if self.system == 'windows' else name
+        bundled = os.path.join(self.workdir, binary)
+        if self.system.startswith('linux'):
+            found = shutil.which(name)
+            if found:
+                return found
+            if not os.path.exists(bundled):
+                print(f"{name} not found, install it with your package manager")
+        return bundled
+
+    def ffmpeg_location(self):
+        """Directory to hand yt-dlp as --ffmpeg-location, None to let it search PATH itself"""
+        ffmpeg = self.path(FFMPEG)
+        return os.path.dirname(ffmpeg) if ffmpeg.startswith(self.workdir) else None
+
+    def info(self, name):
+        """{'path', 'version', 'size', 'mtime', 'capabilities'} for a tool, None if it is missing"""
+        return self.probe(self.path(name), name)
+
+    def probe(self, path, name=None):
+        """Cached info for the binary at path, probed again only if it changed"""
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry
+
+        try:
+            entry = {'name': name, 'path': key, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                     'version': probe_version(name, path), 'capabilities': probe_capabilities(name, path)}
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Could not probe {path}: {e}")
+            return None
+        with self._lock:
+            self._entries[key] = entry
+            self._save()
+        return entry
+
+    def version(self, name):
+        entry = self.info(name)
+        return entry['version'] if entry else None
+
+    def has_encoder(self, encoder):
+        """False only when ffmpeg is known to lack the encoder"""
+        entry = self.info(FFMPEG)
+        encoders = entry['capabilities'].get('encoders') if entry else None
+        return not encoders or encoder in encoders
+
+    def warm_up(self):
+        """Probe every tool on a background thread, so later lookups are cache hits"""
+        def run():
+            for name in TOOLS:
+                self.info(name)
+        threading.Thread(target=run, daemon=True).start()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_tool_registry():
+    """Tool registry shared by every downloader in this process"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ToolRegistry()
+        return _registry
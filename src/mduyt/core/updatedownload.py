@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import requests
+from src.mduyt.core.httpcache import REQUEST_TIMEOUT, get_session
+from src.mduyt.core.integrity import SHA256, DownloadHasher
+from src.mduyt.core.retry import NETWORK, PERMANENT, SEGMENT_POLICY, TIMEOUT, classify, sleep_unless, status_class
+
+CHUNK_SIZE = 1024 * 1024
+WRITE_BUFFER = 4 * 1024 * 1024
+PROGRESS_INTERVAL = 0.25
+PART_SUFFIX = '.part'
+META_SUFFIX = '.part.json'
+
+class UpdateDownloadError(Exception):
+    pass
+
+class DigestMismatch(UpdateDownloadError):
+    pass
+
+class DownloadCancelled(UpdateDownloadError):
+    pass
+
+def asset_digest(asset):
+    """SHA-256 GitHub publishes for a release asset ('sha256:<hex>'), None for older releases"""
+    digest = (asset or {}).get('digest') or ''
+    algorithm, _, value = digest.partition(':')
+    return value.lower() if algorithm == SHA256 and value else None
+
+def sums_digest(sums_text, filename):
+    """Digest of filename in a sha256sum style listing such as yt-dlp's SHA2-256SUMS"""
+    for line in sums_text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].lstrip('*') == filename:
+            return parts[0].lower()
+    return None
+
+class ProgressThrottle:
+    """Calls callback(downloaded, total) at most every interval seconds, plus once at the end"""
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.last = 0.0
+
+    def __call__(self, downloaded, total, final=False):
+        if not self.callback:
+            return
+        now = time.monotonic()
+        if final or now - self.last >= self.interval:
+            self.last = now
+            self.callback(downloaded, total)
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_meta(meta_path, meta):
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _hash_existing(hasher, path, size):
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise UpdateDownloadError(f"{path} is shorter than recorded")
+            hasher.update(data)
+            remaining -= len(data)
+
+def _fetch(session, url, part_path, meta_path, progress, should_stop):
+    """One attempt: continue part_path from where it ends, returns the hasher over the whole file"""
+    meta = _load_meta(meta_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if meta.get('url') != url:
+        offset = 0
+
+    headers = {}
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+        # Only continue the same file; a replaced asset comes back whole as a 200
+        validator = meta.get('etag') or meta.get('last_modified')
+        if validator:
+            headers['If-Range'] = validator
+
+    with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 416 and offset:
+            # Range beyond the end: the part is stale or the asset shrank
+            _remove(part_path, meta_path)
+            raise UpdateDownloadError("Partial download no longer matches the remote file")
+        response.raise_for_status()
+        if response.status_code != 206:
+            offset = 0
+        length = int(response.headers.get('content-length', 0))
+        total = offset + length if length else 0
+
+        _save_meta(meta_path, {'url': url, 'etag': response.headers.get('ETag'),
+                               'last_modified': response.headers.get('Last-Modified')})
+        hasher = DownloadHasher((SHA256,))
+        if offset:
+            _hash_existing(hasher, part_path, offset)
+
+        downloaded = offset
+        with open(part_path, 'ab' if offset else 'wb', buffering=WRITE_BUFFER) as f:
+            f.truncate(offset)
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if should_stop():
+                    raise DownloadCancelled("Download cancelled")
+                f.write(chunk)
+                hasher.update(chunk)
+                downloaded += len(chunk)
+                progress(downloaded, total)
+            f.flush()
+            os.fsync(f.fileno())
+
+    if total and downloaded != total:
+        raise requests.ConnectionError(f"Connection closed at {downloaded} of {total} bytes")
+    progress(downloaded, total, final=True)
+    return hasher
+
+def download_update(url, target_path, expected_sha256=None, progress_callback=None,
+                    should_stop=lambda: False, session=None, policy=SEGMENT_POLICY):
+    """Download url to target_path for an update, returns the SHA-256 of the file.
+
+    Bytes go to target_path + '.part', which a later call continues with a Range request
+    as long as the server still has the same file. The digest is computed while writing
+    and checked against expected_sha256 before target_path is atomically replaced, so
+    target_path only ever holds the old file or the complete, verified new one.
+    progress_callback(downloaded, total) is throttled; total is 0 when unknown.
+    """
+    session = session or get_session()
+    part_path = target_path + PART_SUFFIX
+    meta_path = target_path + META_SUFFIX
+    progress = ProgressThrottle(progress_callback)
+
+    attempt = 0
+    while True:
+        try:
+            hasher = _fetch(session, url, part_path, meta_path, progress, should_stop)
+            break
+        except DownloadCancelled:
+            raise
+        except (requests.RequestException, UpdateDownloadError, OSError) as e:
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if isinstance(e, OSError) and not isinstance(e, requests.RequestException):
+                # Writing the .part file failed (disk full, no permission), another attempt will too
+                failure = PERMANENT
+            elif status:
+                failure = status_class(status)
+            elif isinstance(e, requests.Timeout):
+                failure = TIMEOUT
+            elif isinstance(e, (requests.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                                UpdateDownloadError)):
+                # A stale .part has already been dropped; the next attempt starts over
+                failure = NETWORK
+            else:
+                failure = classify(e)
+            if not policy.should_retry(failure, attempt):
+                raise
+            if not sleep_unless(policy.delay(failure, attempt), should_stop):
+                raise DownloadCancelled("Download cancelled")
+            attempt += 1
+
+    digest = hasher.finish()[SHA256]
+    if expected_sha256 and digest != expected_sha256.lower():
+        _remove(part_path, meta_path)
+        raise DigestMismatch(f"Checksum mismatch for {os.path.basename(target_path)}: "
+                             f"expected {expected_sha256}, got {digest}")
+    os.replace(part_path, target_path)
+    _remove(meta_path)
+    return digest
@@ -8,6 +8,10 @@ import shutil
 import subprocess
 from PySide6.QtWidgets import QMessageBox
 from PySide6.QtCore import QObject, Signal
+from src.mduyt.core.httpcache import get_http_cache
+from src.mduyt.core.updatedownload import asset_digest, download_update
+from src.mduyt.core.manifest import (MANIFEST_NAME, STAGING_DIR, RangeNotSupported, apply_staged, changed_files,
+                                     fetch_entries, load_manifest, record_installed, removed_files)
 
 
 class UpdaterSignals(QObject):
@@ -22,12 +26,12 @@ class GitHubUpdater:
         self.is_portable = is_portable
         self.api_url = "https://api.github.com/repos/project-mdu/mdu-yt/releases/latest"
         self.signals = UpdaterSignals()
+        self.last_digest = None
 
     def check_for_updates(self):
         try:
-            response = requests.get(self.api_url)
-            response.raise_for_status()
-            latest_release = response.json()
+            # Always revalidated, an explicit check should see a release published a minute ago
+            latest_release = get_http_cache().get_json(self.api_url, max_age=0)
             latest_version = latest_release['tag_name'].lstrip('v')
 
             if version.parse(latest_version) > version.parse(self.current_version):
@@ -50,35 +54,92 @@ class GitHubUpdater:
                 raise ValueError("No suitable asset found in the release")
 
             download_url = asset['browser_download_url']
-            with tempfile.TemporaryDirectory() as temp_dir:
-                local_path = os.path.join(temp_dir, asset['name'])
-                self._download_file(download_url, local_path)
+            # A fixed location, so an interrupted download is continued by the next attempt
+            download_dir = os.path.join(tempfile.gettempdir(), 'mdu-update')
+            os.makedirs(download_dir, exist_ok=True)
 
-                if self.is_portable:
-                    self._update_portable(local_path)
-                else:
-                    self._run_installer(local_path)
+            manifest = None
+            if self.is_portable:
+                manifest = self._fetch_manifest(release, download_dir)
+                if manifest and manifest.get('package') == asset['name']:
+                    try:
+                        self._update_differential(download_url, manifest)
+                    except (RangeNotSupported, requests.RequestException, OSError) as e:
+                        # No ranges, a file that failed its checksum, a dropped connection or a
+                        # failed swap (rolled back); the full package still works in all cases
+                        print(f"Differential update failed ({e}), downloading the full package")
+                    else:
+                        self._restart()
+
+            local_path = os.path.join(download_dir, asset['name'])
+            self._download_file(download_url, local_path, asset_digest(asset))
+
+            if self.is_portable:
+                self._update_portable(local_path, manifest)
+            else:
+                self._run_installer(local_path)
 
             self.signals.update_completed.emit()
         except Exception as e:
             self.signals.update_error.emit(f"Error during update: {str(e)}")
 
-    def _download_file(self, url, local_path):
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        total_size = int(response.headers.get('content-length', 0))
-        block_size = 8192
-
-        with open(local_path, 'wb') as file:
-            downloaded = 0
-            for data in response.iter_content(block_size):
-                file.write(data)
-                downloaded += len(data)
-                progress = int((downloaded / total_size) * 100)
-                self.signals.update_progress.emit(progress)
-
-    def _update_portable(self, zip_path):
-        app_dir = os.path.dirname(sys.executable if getattr(sys, 'frozen', False) else __file__)
+    def _download_file(self, url, local_path, expected_sha256=None):
+        last_percent = [-1]
+
+        def on_progress(downloaded, total):
+            # No Content-Length, no percentage
+            percent = int(downloaded * 100 / total) if total else 0
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.signals.update_progress.emit(percent)
+
+        # SHA-256 of what was written, computed on the way so the package is not read twice
+        self.last_digest = download_update(url, local_path, expected_sha256=expected_sha256,
+                                           progress_callback=on_progress)
+        return self.last_digest
+
+    def _app_dir(self):
+        return os.path.dirname(sys.executable if getattr(sys, 'frozen', False) else __file__)
+
+    def _fetch_manifest(self, release, download_dir):
+        """The release's file manifest, None for releases published without one"""
+        asset = next((asset for asset in release['assets'] if asset['name'] == MANIFEST_NAME), None)
+        if not asset:
+            return None
+        path = os.path.join(download_dir, MANIFEST_NAME)
+        try:
+            download_update(asset['browser_download_url'], path, expected_sha256=asset_digest(asset))
+        except Exception as e:
+            print(f"Could not download the update manifest: {e}")
+            return None
+        return load_manifest(path)
+
+    def _update_differential(self, package_url, manifest):
+        """Fetch only the files that differ from the installed ones out of the release zip"""
+        app_dir = self._app_dir()
+        installed = load_manifest(os.path.join(app_dir, MANIFEST_NAME))
+        changed = changed_files(manifest, app_dir, installed)
+        removed = removed_files(manifest, installed)
+
+        staging_dir = os.path.join(app_dir, STAGING_DIR)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        last_percent = [-1]
+
+        def on_progress(downloaded, total):
+            percent = int(downloaded * 100 / total) if total else 0
+            if percent != last_percent[0]:
+                last_percent[0] = percent
+                self.signals.update_progress.emit(percent)
+
+        try:
+            fetch_entries(package_url, changed, manifest, staging_dir, on_progress)
+            apply_staged(app_dir, staging_dir, changed, removed)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        record_installed(manifest, app_dir, removed)
+
+    def _update_portable(self, zip_path, manifest=None):
+        app_dir = self._app_dir()
         with tempfile.TemporaryDirectory() as temp_dir:
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall(temp_dir)
@@ -90,13 +151,20 @@ class GitHubUpdater:
                     shutil.copytree(s, d, dirs_exist_ok=True)
                 else:
                     shutil.copy2(s, d)
+        os.remove(zip_path)
+        if manifest:
+            # Lets the next update be a differential one
+            record_installed(manifest, app_dir)
+
+        self._restart()
 
-        # Restart the application
+    def _restart(self):
         os.execl(sys.executable, sys.executable, *sys.argv)
 
     def _run_installer(self, installer_path):
         # Run the Inno Setup installer with silent install flags
         subprocess.run(installer_path, check=True)
+        os.remove(installer_path)
 
         # After installation, we need to exit the current application
         # The new version will be launched by the installer
@@ -0,0 +1,200 @@
+import os
+import sys
+import threading
+import multiprocessing
+
+def current_rss():
+    """Resident set size of the current process in bytes, 0 if it cannot be determined"""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return 0
+        import resource
+        # ru_maxrss is the peak, in bytes on macOS and KiB elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+def _worker_main(conn):
+    # Importing yt_dlp (and with it every extractor) is the expensive part of a
+    # cold start, do it once before the first job arrives.
+    from src.mduyt.core.engine import HookTranslator, run_inprocess
+
+    translator = HookTranslator(lambda *args: conn.send(('progress', args)),
+                                lambda *args: conn.send(('file', args)))
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        url, options, segments = job
+        try:
+            error = run_inprocess(url, options, translator, segments)
+        except Exception as e:
+            error = str(e)
+        conn.send(('done', error, current_rss()))
+    conn.close()
+
+class WorkerProcess:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.rss = 0
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.conn.close()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class WorkerPool:
+    """Long-lived yt-dlp worker processes that keep the module imported between jobs"""
+
+    def __init__(self, size=3, max_jobs_per_worker=50, max_rss=512 * 1024 * 1024):
+        self.size = max(1, size)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss = max_rss
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = []
+        self._busy = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def resize(self, size):
+        with self._condition:
+            self.size = max(1, size)
+            while self._idle and len(self._idle) + self._busy > self.size:
+                self._idle.pop().close()
+            self._condition.notify_all()
+
+    def warm(self, count=None):
+        """Start idle workers ahead of the first jobs"""
+        with self._condition:
+            count = min(count or self.size, self.size)
+            while len(self._idle) + self._busy < count:
+                self._idle.append(WorkerProcess(self._context))
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Worker pool is shut down")
+                while self._idle:
+                    worker = self._idle.pop()
+                    if worker.is_alive():
+                        self._busy += 1
+                        return worker
+                    worker.kill()
+                if self._busy < self.size:
+                    self._busy += 1
+                    break
+                self._condition.wait()
+        try:
+            return WorkerProcess(self._context)
+        except Exception:
+            with self._condition:
+                self._busy -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, worker, reusable=True):
+        recycle = (not reusable or not worker.is_alive()
+                   or worker.jobs >= self.max_jobs_per_worker
+                   or (self.max_rss and worker.rss > self.max_rss))
+        with self._condition:
+            self._busy -= 1
+            if not recycle and not self._closed and len(self._idle) + self._busy < self.size:
+                self._idle.append(worker)
+                worker = None
+            self._condition.notify()
+        if worker is not None:
+            if worker.is_alive():
+                worker.close()
+            # Keep the pool warm when an old worker is recycled
+            if not self._closed:
+                threading.Thread(target=self.warm, daemon=True).start()
+
+    def run(self, url, options, on_progress, on_file, should_stop=lambda: False, segments=0):
+        """Run one job on a pooled worker, returns None on success or an error message"""
+        worker = self.acquire()
+        reusable = False
+        try:
+            worker.conn.send((url, options, segments))
+            while True:
+                if should_stop():
+                    worker.kill()
+                    return "Download stopped by user"
+                if not worker.conn.poll(0.2):
+                    if not worker.is_alive():
+                        return "yt-dlp worker exited unexpectedly"
+                    continue
+                message = worker.conn.recv()
+                if message[0] == 'progress':
+                    on_progress(*message[1])
+                elif message[0] == 'file':
+                    on_file(*message[1])
+                elif message[0] == 'done':
+                    _, error, worker.rss = message
+                    worker.jobs += 1
+                    reusable = True
+                    return error
+        except (EOFError, OSError):
+            return "yt-dlp worker exited unexpectedly"
+        finally:
+            self.release(worker, reusable)
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in idle:
+            worker.close()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool(size=None):
+    """Shared worker pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(size or 3)
+        elif size:
+            _pool.resize(size)
+        return _pool
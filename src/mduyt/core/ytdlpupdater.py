@@ -0,0 +1,144 @@
+import os
+import sys
+import json
+import time
+import threading
+import requests
+from PySide6.QtCore import QObject, Signal
+from src.mduyt.core.httpcache import REQUEST_TIMEOUT, get_http_cache, get_session
+from src.mduyt.core.updatedownload import asset_digest, download_update, sums_digest
+from src.mduyt.core.toolregistry import YT_DLP, get_tool_registry
+
+LATEST_RELEASE_API = "https://api.github.com/repos/yt-dlp/yt-dlp/releases/latest"
+LATEST_EXE_URL = "https://github.com/yt-dlp/yt-dlp/releases/latest/download/yt-dlp.exe"
+
+# How long a "latest version" answer from GitHub is trusted before asking again
+LATEST_VERSION_TTL = 6 * 60 * 60
+
+def info_path(app_dir):
+    return os.path.join(app_dir, 'info.json')
+
+def load_info(app_dir, default_appversion=None):
+    """Load info from info.json"""
+    try:
+        with open(info_path(app_dir), 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {"appversion": default_appversion, "ytdlpversion": None}
+
+def save_info(app_dir, info):
+    """Save info to info.json"""
+    try:
+        temp_path = info_path(app_dir) + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(info, f, indent=4)
+        os.replace(temp_path, info_path(app_dir))
+    except Exception:
+        pass
+
+def ytdlp_exe_path(app_dir):
+    return os.path.join(app_dir, 'bin', 'win', 'yt-dlp.exe')
+
+def get_ytdlp_exe_version(app_dir, info):
+    """Version of the bundled yt-dlp.exe, probed only when the file changed since the last time"""
+    entry = get_tool_registry().probe(ytdlp_exe_path(app_dir), YT_DLP)
+    version = entry['version'] if entry else None
+    if version:
+        # Shown in the About dialog; an unknown version keeps the last one that was known
+        info['ytdlpversion'] = version
+    return version
+
+def get_latest_ytdlp_version(info, ttl=LATEST_VERSION_TTL):
+    """Latest yt-dlp release tag, from info while the cached answer is younger than ttl"""
+    checked_at = info.get('ytdlp_latest_checked_at', 0)
+    if info.get('ytdlp_latest_version') and time.time() - checked_at < ttl:
+        return info['ytdlp_latest_version']
+    try:
+        # Past the TTL, revalidate: an unchanged release costs a 304 instead of a full response
+        version = get_http_cache().get_json(LATEST_RELEASE_API, max_age=0)['tag_name']
+    except (requests.RequestException, KeyError, TypeError):
+        # Offline: keep using whatever was known last
+        return info.get('ytdlp_latest_version')
+    info['ytdlp_latest_version'] = version
+    info['ytdlp_latest_checked_at'] = time.time()
+    return version
+
+def latest_ytdlp_asset():
+    """Download URL and published SHA-256 of the latest yt-dlp.exe"""
+    release = get_http_cache().get_json(LATEST_RELEASE_API)
+    assets = {asset['name']: asset for asset in release.get('assets', [])}
+    exe = assets.get('yt-dlp.exe')
+    if not exe:
+        return LATEST_EXE_URL, None
+    digest = asset_digest(exe)
+    if not digest and 'SHA2-256SUMS' in assets:
+        response = get_session().get(assets['SHA2-256SUMS']['browser_download_url'], timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        digest = sums_digest(response.text, 'yt-dlp.exe')
+    return exe['browser_download_url'], digest
+
+def download_latest_ytdlp(app_dir, progress_callback=None):
+    """Download yt-dlp.exe, verify it and swap it in, returns True on success"""
+    target_path = ytdlp_exe_path(app_dir)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    def on_progress(downloaded, total):
+        if total and progress_callback:
+            progress_callback(downloaded / total * 100)
+
+    try:
+        url, digest = latest_ytdlp_asset()
+        # The old binary keeps working until the verified new one replaces it
+        download_update(url, target_path, expected_sha256=digest, progress_callback=on_progress)
+        return True
+    except Exception as e:
+        print(f"Download error: {str(e)}")
+        return False
+
+class YtDlpUpdater(QObject):
+    """Checks for and installs a newer yt-dlp.exe on a background thread after the window is up.
+
+    status carries human readable progress for the status bar; finished carries the yt-dlp
+    version in use afterwards (empty if unknown).
+    """
+    status = Signal(str)
+    finished = Signal(str)
+
+    def __init__(self, app_dir, parent=None):
+        super().__init__(parent)
+        self.app_dir = app_dir
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        info = load_info(self.app_dir)
+        if sys.platform != 'win32':
+            # Only the Windows build ships yt-dlp.exe to replace; elsewhere just report the version in use
+            local_version = get_tool_registry().version(YT_DLP)
+            if local_version:
+                info['ytdlpversion'] = local_version
+                save_info(self.app_dir, info)
+            self.finished.emit(local_version or info.get('ytdlpversion') or "")
+            return
+
+        local_version = get_ytdlp_exe_version(self.app_dir, info)
+        latest_version = get_latest_ytdlp_version(info)
+
+        if latest_version and local_version != latest_version:
+            self.status.emit(f"Downloading yt-dlp {latest_version}...")
+
+            def on_progress(progress):
+                self.status.emit(f"Downloading yt-dlp {latest_version}... {progress:.0f}%")
+
+            if download_latest_ytdlp(self.app_dir, on_progress):
+                local_version = latest_version
+                info['ytdlpversion'] = latest_version
+                self.status.emit(f"yt-dlp updated to {latest_version}")
+            else:
+                self.status.emit("yt-dlp update failed, continuing with the current version")
+
+        save_info(self.app_dir, info)
+        self.finished.emit(local_version or info.get('ytdlpversion') or "")
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    filename TEXT NOT NULL,
+    path TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    url TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL DEFAULT '',
+    uploader TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS history_timestamp ON history (timestamp);
+CREATE INDEX IF NOT EXISTS history_file_type ON history (file_type);
+CREATE INDEX IF NOT EXISTS history_path ON history (path, filename);
+CREATE INDEX IF NOT EXISTS history_url ON history (url);
+"""
+
+# Columns added after the first schema version, for databases created before them
+ADDED_COLUMNS = {'title': "TEXT NOT NULL DEFAULT ''", 'uploader': "TEXT NOT NULL DEFAULT ''"}
+
+# Trigram tokens match any substring of three or more characters, like a search-as-you-type box expects
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+    filename, path, title, uploader, url, content='history', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+    INSERT INTO history_fts (rowid, filename, path, title, uploader, url)
+    VALUES (new.id, new.filename, new.path, new.title, new.uploader, new.url);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, filename, path, title, uploader, url)
+    VALUES ('delete', old.id, old.filename, old.path, old.title, old.uploader, old.url);
+END;
+CREATE TRIGGER IF NOT EXISTS history_fts_update AFTER UPDATE ON history BEGIN
+    INSERT INTO history_fts (history_fts, rowid, filename, path, title, uploader, url)
+    VALUES ('delete', old.id, old.filename, old.path, old.title, old.uploader, old.url);
+    INSERT INTO history_fts (rowid, filename, path, title, uploader, url)
+    VALUES (new.id, new.filename, new.path, new.title, new.uploader, new.url);
+END;
+"""
+TRIGRAM = 3
+
+COLUMNS = ('id', 'timestamp', 'filename', 'path', 'file_type', 'url', 'title', 'uploader')
+SEARCHED = "(h.filename || ' ' || h.path || ' ' || h.title || ' ' || h.uploader || ' ' || h.url)"
+
+def like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+class HistoryStore:
+    """Download history in an SQLite database in WAL mode.
+
+    Every change is a single-row statement, so adding a download costs the same no matter
+    how long the history is. Rows are returned as dicts with the keys of COLUMNS, newest
+    first. The connection is shared between threads behind a lock.
+
+    Text search goes through an FTS5 trigram index over filename, path, title, uploader
+    and URL that triggers keep in sync. SQLite builds without FTS5 fall back to LIKE.
+    """
+
+    def __init__(self, path='history.db', legacy_json='history.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # WAL with synchronous=NORMAL only loses the last commits on power failure, never corrupts
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(history)")}
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE history ADD COLUMN {column} {definition}")
+            self.fts = self._create_fts(rebuild=version < 2)
+            # Without the index this stays a version 1 database, so a later start tries to create it again
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION if self.fts else 1}")
+            self._conn.commit()
+        if legacy_json:
+            self.migrate_json(legacy_json)
+
+    def _create_fts(self, rebuild):
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError as e:
+            print(f"Full-text history search unavailable ({e}), using plain text matching")
+            return False
+        if rebuild:
+            # Index the rows that existed before the index did
+            self._conn.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+        return True
+
+    def migrate_json(self, json_path):
+        """Import the old history.json once, then keep it as history.json.migrated"""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return 0
+
+        rows = []
+        now = time.time()
+        # history.json lists the newest entry first; insert oldest first so ids keep the order
+        for entry in reversed(entries):
+            if not isinstance(entry, dict) or not entry.get('filename'):
+                continue
+            file_path = os.path.join(entry.get('path', ''), entry['filename'])
+            timestamp = os.path.getmtime(file_path) if os.path.exists(file_path) else now
+            rows.append((timestamp, entry['filename'], entry.get('path', ''), entry.get('file_type', 'Unknown'),
+                         entry.get('url', ''), os.path.splitext(entry['filename'])[0]))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO history (timestamp, filename, path, file_type, url, title) VALUES (?, ?, ?, ?, ?, ?)",
+                rows)
+        os.replace(json_path, json_path + '.migrated')
+        return len(rows)
+
+    def add(self, filename, path, file_type, url='', timestamp=None, title=None, uploader=''):
+        row = {'timestamp': timestamp or time.time(), 'filename': filename, 'path': path, 'file_type': file_type,
+               'url': url or '', 'title': os.path.splitext(filename)[0] if title is None else title,
+               'uploader': uploader or ''}
+        self.apply([('add', row)])
+        return row['id']
+
+    def apply(self, operations):
+        """Run ('add' | 'update' | 'delete', row) and ('clear', None) operations in one transaction.
+
+        Added rows get their new 'id'; updates rewrite filename, file_type, title and uploader.
+        """
+        with self._lock, self._conn:
+            for operation, row in operations:
+                if operation == 'add':
+                    cursor = self._conn.execute(
+                        "INSERT INTO history (timestamp, filename, path, file_type, url, title, uploader) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (row['timestamp'], row['filename'], row['path'], row['file_type'], row.get('url', ''),
+                         row.get('title', ''), row.get('uploader', '')))
+                    row['id'] = cursor.lastrowid
+                elif operation == 'update':
+                    self._conn.execute(
+                        "UPDATE history SET filename = ?, file_type = ?, title = ?, uploader = ? WHERE id = ?",
+                        (row['filename'], row['file_type'], row.get('title', ''), row.get('uploader', ''), row['id']))
+                elif operation == 'delete':
+                    self._conn.execute("DELETE FROM history WHERE id = ?", (row['id'],))
+                elif operation == 'clear':
+                    self._conn.execute("DELETE FROM history")
+
+    def delete(self, entry_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history WHERE id = ?", (entry_id,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM history")
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    def page(self, limit, before_id=None, text='', file_type=None, since=None, until=None):
+        """Up to limit rows older than before_id (from the newest if None), newest first.
+
+        text keeps rows containing every whitespace separated term in their filename, path,
+        title, uploader or URL; file_type and the since/until timestamps narrow it further.
+        Keyset pagination on the primary key, so fetching a page deep into a long history
+        costs the same as fetching the first one.
+        """
+        terms = text.split()
+        indexed = [term for term in terms if self.fts and len(term) >= TRIGRAM]
+        # With indexed terms the FTS table drives the query: it walks its matches newest first
+        # and stops at limit, instead of collecting every match for a common term to sort them.
+        order = "f.rowid" if indexed else "h.id"
+
+        conditions = []
+        params = []
+        if indexed:
+            conditions.append("history_fts MATCH ?")
+            params.append(' AND '.join(fts_phrase(term) for term in indexed))
+        if before_id is not None:
+            conditions.append(f"{order} < ?")
+            params.append(before_id)
+        if file_type:
+            conditions.append("h.file_type = ?")
+            params.append(file_type)
+        if since is not None:
+            conditions.append("h.timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("h.timestamp < ?")
+            params.append(until)
+
+        for term in terms:
+            if term not in indexed:
+                # Too short for a trigram, or no FTS5 in this SQLite build
+                conditions.append(f"{SEARCHED} LIKE ? ESCAPE '\\'")
+                params.append(like_pattern(term))
+
+        query = f"SELECT {', '.join('h.' + column for column in COLUMNS)} FROM "
+        query += "history_fts f JOIN history h ON h.id = f.rowid" if indexed else "history h"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+
+# yt-dlp names the separate streams of a merged download title.f137.mp4, title.f140.m4a, ...
+FORMAT_STREAM_RE = re.compile(r'\.f\d+(?:-\d+)?\.\w+$')
+
+def is_intermediate(filename):
+    """True for format streams that yt-dlp merges and deletes afterwards"""
+    return FORMAT_STREAM_RE.search(filename) is not None
+
+def history_key(job_id, url, path, filename):
+    """Files of one download share this key: the .webm and the .mp3 extracted from it, for example.
+
+    job_id is the scheduler job that produced the file, so downloading the same URL again,
+    or the same title in another format, gets a row of its own.
+    """
+    stem = FORMAT_STREAM_RE.sub('', filename)
+    if stem == filename:
+        stem = os.path.splitext(filename)[0]
+    return job_id, url, path, stem
+
+class HistoryWriter:
+    """Write-behind buffer in front of a HistoryStore.
+
+    add(), update() and delete() only queue the change and return. A background thread
+    commits everything queued in one transaction every interval seconds, or right away
+    when flush() is called at a batch boundary such as the end of a queue. Rows are the
+    same dicts the model shows; an added row gets its 'id' once it has been committed.
+
+    flush() can also take a callback, called on the writer thread once the flush has been
+    committed, for callers such as the GUI thread that must not block on it.
+    """
+
+    def __init__(self, store, interval=2.0):
+        self.store = store
+        self.interval = interval
+        self._pending = []
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._committed = 0
+        self._requested = 0
+        self._callbacks = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, row):
+        self._queue(('add', row))
+
+    def update(self, row):
+        with self._condition:
+            # A row that is still waiting to be added goes in with its latest values anyway
+            if any(op == 'add' and queued is row for op, queued in self._pending):
+                return
+        self._queue(('update', row))
+
+    def delete(self, row):
+        with self._condition:
+            if any(op == 'add' and queued is row for op, queued in self._pending):
+                # Never written, so there is nothing to delete
+                self._pending = [item for item in self._pending if item[1] is not row]
+                return
+        self._queue(('delete', row))
+
+    def clear(self):
+        """Delete every row, including the ones still waiting to be added"""
+        with self._condition:
+            self._pending = [('clear', None)]
+        self.flush()
+
+    def _queue(self, operation):
+        with self._condition:
+            self._pending.append(operation)
+
+    def flush(self, wait=False, callback=None):
+        """Commit what is queued now instead of at the next interval"""
+        with self._condition:
+            self._requested += 1
+            target = self._requested
+            self._flush_requested = True
+            self._condition.notify_all()
+            if callback is not None and self._thread.is_alive():
+                self._callbacks.append((target, callback))
+                callback = None
+            if wait:
+                while self._committed < target and self._thread.is_alive():
+                    self._condition.wait(0.1)
+        if callback is not None:
+            # The writer thread is gone, nothing will be committed anymore
+            callback()
+
+    def close(self):
+        self.flush(wait=True)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._flush_requested and not self._closed:
+                    self._condition.wait(self.interval)
+                self._flush_requested = False
+                target = self._requested
+                operations, self._pending = self._pending, []
+                closed = self._closed
+            if operations:
+                try:
+                    self.store.apply(operations)
+                except Exception as e:
+                    print(f"Could not save download history: {e}")
+            with self._condition:
+                self._committed = max(self._committed, target)
+                done = [callback for requested, callback in self._callbacks if requested <= self._committed]
+                self._callbacks = [item for item in self._callbacks if item[0] > self._committed]
+                self._condition.notify_all()
+            for callback in done:
+                callback()
+            if closed:
+                return
@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, Signal
+from src.mduyt.data.historywriter import history_key, is_intermediate
+
+class HistoryModel(QAbstractListModel):
+    """List model over a HistoryStore that loads rows a page at a time as the view scrolls.
+
+    Nothing is read at construction; the view calls fetchMore() when it needs rows past
+    the ones already loaded, so startup and memory do not depend on the history size.
+    Qt.UserRole returns the row dict the HistoryDelegate paints.
+
+    With a filter set, pages are queried on a background thread and delivered through a
+    queued signal; results of a filter that has since been replaced are dropped.
+
+    Changes go through a HistoryWriter, so adding a download never touches the disk on
+    the GUI thread. Reads that need queued changes committed first ask the writer for a
+    flush and carry on when its completion arrives through a queued signal.
+    """
+    _page_loaded = Signal(int, list)
+    _flushed = Signal(int)
+
+    def __init__(self, store, writer, page_size=200, recent_size=500, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.writer = writer
+        # Latest row per history_key, so a merge or audio extraction output replaces its source file
+        self.recent = OrderedDict()
+        self.recent_size = recent_size
+        self.page_size = page_size
+        self.rows = []
+        self.exhausted = False
+        self.filter = {}
+        self.generation = 0
+        self.loading = False
+        self._page_loaded.connect(self._append_page)
+        self._flushed.connect(self._resume_fetch)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.UserRole:
+            return row
+        if role == Qt.DisplayRole:
+            return row['filename']
+        if role == Qt.ToolTipRole:
+            return f"{row['path']}/{row['filename']}"
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted or self.loading:
+            return
+        if any(row.get('id') is None for row in self.rows):
+            # Rows added since startup need their ids before they can anchor the next page
+            self._fetch_after_flush()
+            return
+        before_id = self.rows[-1]['id'] if self.rows else None
+        if not self.filter:
+            # Unfiltered pages are a primary key range scan, cheap enough for the GUI thread
+            self._append_page(self.generation, self.store.page(self.page_size, before_id))
+            return
+
+        self.loading = True
+        generation, query = self.generation, dict(self.filter)
+
+        def load():
+            self._page_loaded.emit(generation, self.store.page(self.page_size, before_id, **query))
+        threading.Thread(target=load, daemon=True).start()
+
+    def _fetch_after_flush(self):
+        self.loading = True
+        generation = self.generation
+        self.writer.flush(callback=lambda: self._flushed.emit(generation))
+
+    def _resume_fetch(self, generation):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.fetchMore()
+
+    def _append_page(self, generation, page):
+        if generation != self.generation:
+            return
+        self.loading = False
+        if len(page) < self.page_size:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def set_filter(self, text='', file_type=None, since=None):
+        """Show only rows matching text, file_type and a minimum timestamp; no arguments shows everything"""
+        query = {'text': text, 'file_type': file_type, 'since': since}
+        query = {key: value for key, value in query.items() if value}
+        if query == self.filter:
+            return
+        self.filter = query
+        self.reload()
+        # Queued additions have to be in the store to be found
+        self._fetch_after_flush()
+
+    def add_entry(self, filename, path, file_type, url="", title="", uploader="", job_id=None):
+        """Record a downloaded file and show it at the top, returns its row or None if it was skipped.
+
+        title and uploader come from yt-dlp's info dict; without them the title is the filename.
+        job_id is the scheduler job the file came from; only files of the same job share a row.
+        """
+        if is_intermediate(filename):
+            return None
+
+        key = history_key(job_id, url, path, filename)
+        row = self.recent.get(key)
+        if row is not None:
+            # A later stage of the same download, e.g. the mp3 extracted from a webm
+            row.update(filename=filename, file_type=file_type, title=title or row['title'],
+                       uploader=uploader or row['uploader'])
+            self.writer.update(row)
+            position = self._position(row)
+            if position is not None:
+                self.dataChanged.emit(self.index(position), self.index(position))
+            return row
+
+        row = {'id': None, 'timestamp': time.time(), 'filename': filename, 'path': path, 'file_type': file_type,
+               'url': url, 'title': title or os.path.splitext(filename)[0], 'uploader': uploader}
+        self.writer.add(row)
+        self.recent[key] = row
+        while len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+        if not self.filter:
+            # Otherwise it shows up once the filter is cleared
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self.rows.insert(0, row)
+            self.endInsertRows()
+        return row
+
+    def _position(self, row):
+        return next((i for i, candidate in enumerate(self.rows) if candidate is row), None)
+
+    def remove_row(self, position):
+        row = self.rows[position]
+        self.writer.delete(row)
+        for key in [key for key, candidate in self.recent.items() if candidate is row]:
+            del self.recent[key]
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self.rows[position]
+        self.endRemoveRows()
+
+    def clear(self):
+        self.writer.clear()
+        self.recent.clear()
+        self.reload()
+        # Nothing older is left to page in; downloads added from now on are inserted at the top
+        self.exhausted = True
+
+    def flush(self):
+        """Batch boundary: commit queued history changes now"""
+        self.writer.flush()
+
+    def reload(self):
+        self.beginResetModel()
+        self.generation += 1
+        self.rows = []
+        self.exhausted = False
+        self.loading = False
+        self.endResetModel()
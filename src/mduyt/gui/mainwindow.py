@@ -1,22 +1,32 @@
 import os
 import sys
 import json
+import time
 import threading
 import subprocess
 import platform
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QLineEdit, QPushButton, QProgressBar, QLabel, QRadioButton,
                                QComboBox, QButtonGroup, QFileDialog, QMessageBox, QListView,
-                               QStyledItemDelegate, QStatusBar, QStyle, QMenu, QDialog, QCheckBox, QSpinBox)
-from PySide6.QtCore import Qt, Slot, QSize, QPoint, __version__
-from PySide6.QtGui import QStandardItemModel, QStandardItem, QIcon, QPalette, QColor, QAction
-from src.mduyt.core.downloader import Downloader
+                               QStyledItemDelegate, QStatusBar, QStyle, QMenu, QDialog, QCheckBox, QSpinBox,
+                               QToolTip)
+from PySide6.QtCore import Qt, Slot, QSize, QPoint, QRect, QEvent, QTimer, __version__
+from PySide6.QtGui import (QIcon, QPalette, QColor, QAction, QFont,
+                           QFontMetrics)
+from src.mduyt.core.progressaggregator import ProgressAggregator
+from src.mduyt.core.scheduler import DownloadScheduler, QUEUED, RUNNING, DONE, FAILED, CANCELLED
+from src.mduyt.core.engine import ENGINE_PROCESS
 from src.mduyt.gui.menubar import MenuBar
 from src.mduyt.gui.multipledownloaddialog import MultipleDownloadDialog
 from src.mduyt.core.updater import GitHubUpdater
 from src.mduyt.utils.version import appversion, appname
 from pathlib import Path
 from src.mduyt.data.donator import donators
+from src.mduyt.data.historystore import HistoryStore
+from src.mduyt.data.historywriter import HistoryWriter
+from src.mduyt.gui.historymodel import HistoryModel
+
+HISTORY_DATE_FILTERS = [("Any time", 0), ("Past 24 hours", 1), ("Past 7 days", 7), ("Past 30 days", 30), ("Past year", 365)]
 
 def normalize_path(path):
     return path.replace(os.sep, '/')
@@ -41,83 +51,38 @@ def load_info():
         pass
     return {"appversion": appversion, "ytdlpversion": "Unknown"}
 
-class HoverButton(QPushButton):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setStyleSheet("""
-            QPushButton {
-                background-color: transparent;
-                border: none;
-                opacity: 0.7;
-            }
-            QPushButton:hover {
-                background-color: rgba(255, 255, 255, 0.1);
-                opacity: 1.0;
-            }
-        """)
-        self.setFixedSize(32, 32)
-
-class HistoryItemWidget(QWidget):
-    def __init__(self, data, parent=None):
-        super().__init__(parent)
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5)
-
-        icon = QIcon(self.get_icon_path(data['file_type']))
-        self.icon_label = QLabel()
-        self.icon_label.setPixmap(icon.pixmap(QSize(32, 32)))
-        layout.addWidget(self.icon_label)
-
-        info_layout = QVBoxLayout()
-        self.filename_label = QLabel(data['filename'])
-        self.filename_label.setStyleSheet("font-weight: bold;")
-        info_layout.addWidget(self.filename_label)
-
-        self.path_label = QLabel(data['path'])
-        self.path_label.setStyleSheet("color: gray;")
-        info_layout.addWidget(self.path_label)
-
-        layout.addLayout(info_layout)
-        layout.addStretch()
-
-        # Add "Open File Location" button with hover effect
-        self.open_location_button = HoverButton(self)
-        self.open_location_button.setIcon(QIcon(":/folder.svg"))
-        self.open_location_button.setToolTip("Open File Location")
-        self.open_location_button.clicked.connect(lambda: self.open_file_location(data))
-        layout.addWidget(self.open_location_button)
-
-        self.setObjectName("historyItem")
-        self.filename_label.setObjectName("filenameLabel")
-        self.path_label.setObjectName("pathLabel")
-
-    def get_icon_path(self, file_type):
-        if file_type == 'Audio':
-            return ":/audio.ico"
-        elif file_type == 'Video':
-            return ":/vid.ico"
-        else:
-            return ":/file.ico"
+def open_file_location(data):
+    file_path = os.path.join(data['path'], data['filename'])
+    if sys.platform == "win32":
+        file_path = windows_path(file_path)
+        subprocess.run(['explorer', '/select,', file_path])
+        print(f"Opening file location: {file_path}")
+    elif sys.platform == "darwin":
+        subprocess.run(['open', '-R', file_path])
+    else:
+        # For Linux, we'll open the folder and try to select the file if possible
+        folder_path = os.path.dirname(file_path)
+        subprocess.run(['xdg-open', folder_path])
 
-    def open_file_location(self, data):
-        file_path = os.path.join(data['path'], data['filename'])
-        if sys.platform == "win32":
-            file_path = windows_path(file_path)
-            subprocess.run(['explorer', '/select,', file_path])
-            print(f"Opening file location: {file_path}")
-        elif sys.platform == "darwin":
-            subprocess.run(['open', '-R', file_path])
-        else:
-            # For Linux, we'll open the folder and try to select the file if possible
-            folder_path = os.path.dirname(file_path)
-            subprocess.run(['xdg-open', folder_path])
+class HistoryDelegate(QStyledItemDelegate):
+    """Paints history rows (icon, filename, path, open location button) without any child widgets.
 
+    Nothing is created per row, so memory does not grow with the history and the view
+    only ever paints the rows that are visible. Clicks and hover on the open location
+    button are hit-tested in editorEvent.
+    """
+    ROW_HEIGHT = 50
+    ICON_SIZE = 32
+    BUTTON_SIZE = 32
+    MARGIN = 5
 
-class HistoryDelegate(QStyledItemDelegate):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.alt_color1 = QColor(53, 53, 53)  # Darker gray
         self.alt_color2 = QColor(45, 45, 45)  # Slightly lighter gray
+        self.hover_row = -1
+        self.icons = {}
+        self.folder_icon = QIcon(":/folder.svg")
         self.update_colors()
 
     def update_colors(self):
@@ -130,23 +95,89 @@ class HistoryDelegate(QStyledItemDelegate):
             self.alt_color1 = base_color.darker(105)
             self.alt_color2 = base_color.darker(110)
 
+    def get_icon(self, file_type):
+        # One QIcon per file type, shared by every row
+        if file_type not in self.icons:
+            if file_type == 'Audio':
+                self.icons[file_type] = QIcon(":/audio.ico")
+            elif file_type == 'Video':
+                self.icons[file_type] = QIcon(":/vid.ico")
+            else:
+                self.icons[file_type] = QIcon(":/file.ico")
+        return self.icons[file_type]
+
+    def button_rect(self, rect):
+        return QRect(rect.right() - self.MARGIN - self.BUTTON_SIZE, rect.top() + (rect.height() - self.BUTTON_SIZE) // 2,
+                     self.BUTTON_SIZE, self.BUTTON_SIZE)
+
     def paint(self, painter, option, index):
         if index.row() % 2 == 0:
             painter.fillRect(option.rect, self.alt_color1)
         else:
             painter.fillRect(option.rect, self.alt_color2)
 
-        if not self.parent().indexWidget(index):
-            data = index.data(Qt.UserRole)
-            if data:
-                widget = HistoryItemWidget(data, self.parent())
-                self.parent().setIndexWidget(index, widget)
-
-        if option.state & QStyle.State_Selected:
+        selected = option.state & QStyle.State_Selected
+        if selected:
             painter.fillRect(option.rect, QColor(42, 130, 218))
 
+        data = index.data(Qt.UserRole)
+        if not data:
+            return
+
+        painter.save()
+        rect = option.rect
+        icon_rect = QRect(rect.left() + self.MARGIN, rect.top() + (rect.height() - self.ICON_SIZE) // 2,
+                          self.ICON_SIZE, self.ICON_SIZE)
+        self.get_icon(data['file_type']).paint(painter, icon_rect)
+
+        button_rect = self.button_rect(rect)
+        text_left = icon_rect.right() + 1 + self.MARGIN
+        text_width = button_rect.left() - self.MARGIN - text_left
+        line_height = (rect.height() - 2 * self.MARGIN) // 2
+
+        bold_font = QFont(option.font)
+        bold_font.setBold(True)
+        painter.setFont(bold_font)
+        painter.setPen(option.palette.color(QPalette.ColorRole.HighlightedText if selected else QPalette.ColorRole.Text))
+        filename = QFontMetrics(bold_font).elidedText(data['filename'], Qt.ElideRight, text_width)
+        painter.drawText(QRect(text_left, rect.top() + self.MARGIN, text_width, line_height),
+                         Qt.AlignLeft | Qt.AlignVCenter, filename)
+
+        painter.setFont(option.font)
+        painter.setPen(option.palette.color(QPalette.ColorRole.HighlightedText) if selected else QColor(Qt.gray))
+        path = QFontMetrics(option.font).elidedText(data['path'], Qt.ElideMiddle, text_width)
+        painter.drawText(QRect(text_left, rect.top() + self.MARGIN + line_height, text_width, line_height),
+                         Qt.AlignLeft | Qt.AlignVCenter, path)
+
+        if index.row() == self.hover_row:
+            painter.fillRect(button_rect, QColor(255, 255, 255, 25))
+        self.folder_icon.paint(painter, button_rect.adjusted(6, 6, -6, -6))
+        painter.restore()
+
     def sizeHint(self, option, index):
-        return QSize(0, 50)
+        return QSize(0, self.ROW_HEIGHT)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() in (QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.MouseButtonRelease):
+            over_button = self.button_rect(option.rect).contains(event.position().toPoint())
+            hover_row = index.row() if over_button else -1
+            if hover_row != self.hover_row:
+                self.hover_row = hover_row
+                self.parent().viewport().update()
+            if over_button and event.button() == Qt.LeftButton:
+                if event.type() == QEvent.MouseButtonRelease:
+                    data = index.data(Qt.UserRole)
+                    if data:
+                        open_file_location(data)
+                # Swallow the press too so the click does not also select the row
+                return True
+        return super().editorEvent(event, model, option, index)
+
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.ToolTip and self.button_rect(option.rect).contains(event.pos()):
+            QToolTip.showText(event.globalPos(), "Open File Location", view)
+            return True
+        return super().helpEvent(event, view, option, index)
 
 class DeleteConfirmationDialog(QDialog):
     def __init__(self, parent=None):
@@ -280,11 +311,38 @@ class MainWindow(QMainWindow):
         self.setStatusBar(self.statusBar)
         self.statusBar.showMessage("Developed by Nawapon Boonjua")
 
-        self.history_model = QStandardItemModel()
+        self.history_store = HistoryStore()
+        self.history_writer = HistoryWriter(self.history_store)
+        self.history_model = HistoryModel(self.history_store, self.history_writer)
+        search_layout = QHBoxLayout()
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search downloads by name, folder or URL")
+        self.history_search.setClearButtonEnabled(True)
+        search_layout.addWidget(self.history_search)
+        self.history_type_filter = QComboBox()
+        self.history_type_filter.addItems(["All types", "Video", "Audio", "Unknown"])
+        search_layout.addWidget(self.history_type_filter)
+        self.history_date_filter = QComboBox()
+        for label, days in HISTORY_DATE_FILTERS:
+            self.history_date_filter.addItem(label, days)
+        search_layout.addWidget(self.history_date_filter)
+        layout.addLayout(search_layout)
+
+        # Typing restarts the timer, so the query runs once the user pauses
+        self.history_search_timer = QTimer(self)
+        self.history_search_timer.setSingleShot(True)
+        self.history_search_timer.setInterval(200)
+        self.history_search_timer.timeout.connect(self.apply_history_filter)
+        self.history_search.textChanged.connect(lambda _text: self.history_search_timer.start())
+        self.history_type_filter.currentIndexChanged.connect(self.apply_history_filter)
+        self.history_date_filter.currentIndexChanged.connect(self.apply_history_filter)
+
         self.history_list = QListView()
         self.history_list.setModel(self.history_model)
         self.history_list.setItemDelegate(HistoryDelegate(self.history_list))
-        self.history_list.setUniformItemSizes(False)
+        # Every row has the delegate's fixed height, so the view can lay out only what is visible
+        self.history_list.setUniformItemSizes(True)
+        self.history_list.setMouseTracking(True)
         self.history_list.setSpacing(2)
         self.history_list.doubleClicked.connect(self.open_file)
         self.history_list.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -309,11 +367,21 @@ class MainWindow(QMainWindow):
         self.clear_history_button.clicked.connect(self.clear_history)
         layout.addWidget(self.clear_history_button)
 
-        self.downloader = Downloader()
-        self.downloader.signals.progress.connect(self.update_progress)
-        self.downloader.signals.file_downloaded.connect(self.add_to_history)
-        self.downloader.signals.finished.connect(self.download_finished)
-        self.downloader.signals.error.connect(self.show_error)
+        # Progress is sampled and delivered to the widgets at most ~30 times per second
+        self.progress_aggregator = ProgressAggregator(parent=self)
+        self.progress_aggregator.progress_batch.connect(self.update_progress_batch)
+
+        self.scheduler = DownloadScheduler(progress_reporter=self.progress_aggregator)
+        # The job started from the URL box; it goes through the scheduler for its retries and backoff,
+        # but runs on its own thread with the yt-dlp binary the updater keeps current
+        self.single_job_id = None
+        self.scheduler.signals.job_file_downloaded.connect(self.job_file_downloaded)
+        self.scheduler.signals.job_state_changed.connect(self.job_state_changed)
+        self.scheduler.signals.queue_finished.connect(self.queue_finished)
+        self.scheduler.signals.job_added.connect(self.job_added)
+        self.scheduler.signals.playlist_started.connect(self.playlist_started)
+        self.scheduler.signals.playlist_enumerated.connect(self.playlist_enumerated)
+        self.scheduler.signals.playlist_error.connect(self.playlist_error)
 
         # Add a label for playlist progress
         self.playlist_progress_label = QLabel()
@@ -328,8 +396,6 @@ class MainWindow(QMainWindow):
         self.toggle_options()
         self.toggle_fps_combo()
 
-        self.load_history()
-
         # Connect text change event
         self.url_input.textChanged.connect(self.check_url)
 
@@ -356,15 +422,142 @@ class MainWindow(QMainWindow):
         self.fps_combo.setEnabled(self.fps_checkbox.isChecked() and self.video_radio.isChecked())
 
     def open_multiple_download_dialog(self):
-        dialog = MultipleDownloadDialog(self)
+        dialog = MultipleDownloadDialog(self, self.scheduler.max_workers)
         dialog.start_downloads.connect(self.handle_multiple_downloads)
         dialog.exec()
 
-    def handle_multiple_downloads(self, urls):
-        for url in urls:
-            # Here you would typically add each URL to your download queue
-            # For demonstration, we'll just print the URLs
-            print(f"Queued for download: {url}")
+    def handle_multiple_downloads(self, urls, concurrency):
+        download_dir = self.normalize_path(self.folder_path.text())
+        if not os.path.isdir(download_dir):
+            QMessageBox.warning(self, "Error", "Invalid download directory")
+            return
+
+        self.scheduler.clear_finished()
+        self.scheduler.set_max_workers(concurrency)
+        options = self.get_download_options()
+        if options['is_playlist']:
+            for url in urls:
+                self.scheduler.submit_playlist(url, download_dir=download_dir, **options)
+        else:
+            self.scheduler.submit_many(urls, download_dir=download_dir, **options)
+
+        self.stop_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.update_queue_status()
+
+    def get_download_options(self):
+        is_audio = self.audio_radio.isChecked()
+        return {
+            'is_audio': is_audio,
+            'audio_format': self.format_combo.currentText() if is_audio else None,
+            'resolution': self.resolution_combo.currentText() if not is_audio else None,
+            'fps': self.fps_combo.currentText() if (not is_audio and self.fps_checkbox.isChecked()) else None,
+            'is_playlist': self.playlist_checkbox.isChecked(),
+            'with_thumbnail': self.thumbnail_checkbox.isChecked(),
+        }
+
+    def update_queue_status(self):
+        counts = self.scheduler.counts()
+        finished = counts[DONE] + counts[FAILED] + counts[CANCELLED]
+        total = finished + counts[QUEUED] + counts[RUNNING]
+        self.playlist_progress_label.setText(
+            f"Queue: {finished}/{total} finished, {counts[RUNNING]} running, {counts[FAILED]} failed")
+
+    @Slot(dict)
+    def update_progress_batch(self, batch):
+        if self.single_job_id in batch:
+            self.update_progress(*batch[self.single_job_id])
+            return
+
+        running = self.progress_aggregator.snapshot()
+        running.pop(self.single_job_id, None)
+        if not running:
+            return
+        # Aggregate over the whole queue: finished items count as complete, running ones by their progress
+        counts = self.scheduler.counts()
+        finished = counts[DONE] + counts[FAILED] + counts[CANCELLED]
+        total = finished + counts[QUEUED] + counts[RUNNING]
+        overall = (finished + sum(state[0] for state in running.values()) / 100) / max(total, 1) * 100
+        self.progress_bar.setValue(int(overall))
+        status = f"Downloading {len(running)} of {total} items: {overall:.1f}%"
+        job_id = max(batch)
+        progress, file_size, download_speed, eta, current_item, total_items = batch[job_id]
+        if download_speed:
+            if current_item:
+                item = f"item {current_item}/{total_items}" if total_items else f"item {current_item}"
+            else:
+                item = f"job {job_id}"
+            status += f" | {item}: {progress:.1f}% at {download_speed}"
+        self.status_label.setText(status)
+
+    @Slot(int, str)
+    def job_added(self, job_id, url):
+        self.update_queue_status()
+
+    @Slot(int, str, str, str, str, str)
+    def job_file_downloaded(self, job_id, filename, file_path, file_type, title, uploader):
+        job = self.scheduler.jobs.get(job_id)
+        self.add_to_history(filename, file_path, file_type, job.url if job else "", title, uploader, job_id)
+
+    @Slot(int, str, str)
+    def job_state_changed(self, job_id, state, message):
+        if state in (DONE, FAILED, CANCELLED):
+            self.progress_aggregator.finish(job_id)
+        if job_id == self.single_job_id:
+            self.single_job_state_changed(state, message)
+            return
+        if state == FAILED:
+            print(f"Download job {job_id} failed: {message}")
+        elif state == RUNNING and message:
+            # A transient failure is being retried after a backoff
+            self.status_label.setText(f"Download {job_id}: {message}")
+            return
+        self.update_queue_status()
+
+    def single_job_state_changed(self, state, message):
+        if state == DONE:
+            self.download_finished()
+        elif state == FAILED:
+            self.show_error(message)
+        elif state == CANCELLED:
+            self.single_job_id = None
+            self.status_label.setText("Download stopped")
+            self.download_button.setEnabled(True)
+            self.stop_button.setEnabled(self.scheduler.has_active_jobs())
+            self.progress_bar.setValue(0)
+        elif state == RUNNING and message:
+            self.status_label.setText(message)
+
+    @Slot(str, str)
+    def playlist_started(self, url, title):
+        self.status_label.setText(f"Downloading playlist: {title} (still fetching entries...)")
+
+    @Slot(str, str, int)
+    def playlist_enumerated(self, url, title, count):
+        if title:
+            self.status_label.setText(f"Queued {count} items from playlist: {title}")
+        self.update_queue_status()
+
+    @Slot(str, str)
+    def playlist_error(self, url, message):
+        self.stop_button.setEnabled(self.scheduler.has_active_jobs() or not self.download_button.isEnabled())
+        self.status_label.setText(f"Error: {message}")
+        QMessageBox.critical(self, "Error", f"Could not read playlist {url}:\n{message}")
+
+    @Slot(int, int, int)
+    def queue_finished(self, done, failed, cancelled):
+        self.history_model.flush()
+        self.stop_button.setEnabled(not self.download_button.isEnabled())
+        if done + failed + cancelled <= 1 and self.download_button.isEnabled():
+            # Only the single download ran, and it has reported its own outcome
+            return
+        self.progress_bar.setValue(0)
+        self.status_label.setText(f"Queue completed: {done} done, {failed} failed, {cancelled} cancelled")
+
+    def closeEvent(self, event):
+        # Queued history changes would otherwise be lost with the writer thread
+        self.history_writer.close()
+        super().closeEvent(event)
 
     def open_downloads_folder(self):
         folder_path = self.folder_path.text()
@@ -524,7 +717,11 @@ class MainWindow(QMainWindow):
     
     @Slot()
     def stop_download(self):
-        self.downloader.stop()
+        if self.single_job_id is not None:
+            # Leaves a batch running alongside it alone
+            self.scheduler.cancel(self.single_job_id)
+        else:
+            self.scheduler.cancel_all()
         self.status_label.setText("Stopping download...")
         self.stop_button.setEnabled(False)
 
@@ -540,36 +737,26 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Invalid download directory")
             return
 
+        options = self.get_download_options()
+        if options['is_playlist']:
+            # Playlists are enumerated and their entries downloaded in parallel by the scheduler
+            self.scheduler.clear_finished()
+            self.scheduler.submit_playlist(url, download_dir=download_dir, **options)
+            self.stop_button.setEnabled(True)
+            self.status_label.setText("Enumerating playlist...")
+            self.progress_bar.setValue(0)
+            return
+
         self.download_button.setEnabled(False)
         self.stop_button.setEnabled(True)
         self.status_label.setText("Starting download...")
         self.progress_bar.setValue(0)
         self.playlist_progress_label.setText("")
 
-        is_audio = self.audio_radio.isChecked()
-        audio_format = self.format_combo.currentText() if is_audio else None
-        resolution = self.resolution_combo.currentText() if not is_audio else None
-        fps = self.fps_combo.currentText() if (not is_audio and self.fps_checkbox.isChecked()) else None
-        is_playlist = self.playlist_checkbox.isChecked()
-        with_thumbnail = self.thumbnail_checkbox.isChecked()
-
-        # if title is None:
-        #     QMessageBox.warning(self, "Error", "Failed to fetch title. Download will not start.")
-        #     self.download_button.setEnabled(True)  # Re-enable the download button
-        #     self.stop_button.setEnabled(False)
-        #     return
-
-        # Start the download thread
-        self.download_thread = threading.Thread(target=self.download_thread_function,
-                                                args=(url, is_audio, audio_format, resolution, fps, download_dir,
-                                                      is_playlist, with_thumbnail),
-                                                daemon=True)
-        self.download_thread.start()
-
-    def download_thread_function(self, url, is_audio, audio_format, resolution, fps, download_dir, 
-                                 is_playlist, with_thumbnail):
-        self.downloader.download(url, is_audio, audio_format, resolution, fps, download_dir, 
-                                 is_playlist, with_thumbnail)
+        self.scheduler.clear_finished()
+        self.single_job_id = self.scheduler.start(url, engine=ENGINE_PROCESS, download_dir=download_dir,
+                                                  **options).id
+
     @Slot(float, str, str, str, int, int)
     def update_progress(self, progress, file_size, download_speed, eta, current_item, total_items):
         self.progress_bar.setValue(int(progress))
@@ -590,17 +777,20 @@ class MainWindow(QMainWindow):
 
     @Slot(str)
     def show_error(self, error_message):
+        self.single_job_id = None
         self.status_label.setText(f"Error: {error_message}")
         self.download_button.setEnabled(True)
-        self.stop_button.setEnabled(False)
+        self.stop_button.setEnabled(self.scheduler.has_active_jobs())
         self.playlist_progress_label.setText("")
         QMessageBox.critical(self, "Error", error_message)
 
     @Slot()
     def download_finished(self):
+        self.single_job_id = None
+        self.history_model.flush()
         self.status_label.setText("Download completed!")
         self.download_button.setEnabled(True)
-        self.stop_button.setEnabled(False)
+        self.stop_button.setEnabled(self.scheduler.has_active_jobs())
         self.playlist_progress_label.setText("")
         QMessageBox.information(self, "Success", "Download completed successfully!")
         self.progress_bar.setValue(0)
@@ -611,10 +801,7 @@ class MainWindow(QMainWindow):
         self.fps_combo.setEnabled(is_video)
         self.format_combo.setEnabled(not is_video)
 
-    @Slot(str, str, str)
-    def add_to_history(self, filename, file_path, file_type):
-        item = QStandardItem()
-
+    def add_to_history(self, filename, file_path, file_type, url="", title="", uploader="", job_id=None):
         # Normalize the filename and path
         normalized_filename = self.normalize_unicode(filename)
         normalized_path = self.normalize_unicode(file_path)
@@ -623,15 +810,8 @@ class MainWindow(QMainWindow):
         if file_type == "Unknown":
             file_type = self.determine_file_type(normalized_filename)
 
-        item_data = {
-            'filename': normalized_filename,
-            'path': normalized_path,
-            'file_type': file_type
-        }
-
-        item.setData(item_data, Qt.UserRole)
-        self.history_model.insertRow(0, item)
-        self.save_history()
+        self.history_model.add_entry(normalized_filename, normalized_path, file_type, url, title, uploader,
+                                     job_id)
 
     def determine_file_type(self, filename):
         if any(filename.lower().endswith(ext) for ext in ['.mp4', '.webm', '.mkv', '.avi', '.mov']):
@@ -650,27 +830,17 @@ class MainWindow(QMainWindow):
             return path.replace('\\', '/')
         return path
 
-    def save_history(self):
-            history_data = []
-            for row in range(self.history_model.rowCount()):
-                item = self.history_model.item(row)
-                item_data = item.data(Qt.UserRole)
-                history_data.append(item_data)
-
-            with open('history.json', 'w', encoding='utf-8') as f:
-                json.dump(history_data, f, ensure_ascii=False, indent=2)
-
-    def load_history(self):
-        try:
-            with open('history.json', 'r', encoding='utf-8') as f:
-                history_data = json.load(f)
+    @Slot()
+    def apply_history_filter(self):
+        text = self.history_search.text().strip()
+        # Shorter terms cannot use the trigram index and would scan the whole history
+        if len(text) < 3:
+            text = ""
+        file_type = self.history_type_filter.currentText() if self.history_type_filter.currentIndex() > 0 else None
+        days = self.history_date_filter.currentData()
+        since = time.time() - days * 86400 if days else None
+        self.history_model.set_filter(text, file_type, since)
 
-            for item_data in history_data:
-                item = QStandardItem()
-                item.setData(item_data, Qt.UserRole)
-                self.history_model.appendRow(item)
-        except FileNotFoundError:
-            pass  # No history file exists yet
     @Slot()
     def clear_history(self):
         reply = QMessageBox.question(self, 'Clear History',
@@ -679,8 +849,6 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.Yes:
             self.history_model.clear()
-            if os.path.exists("download_history.json"):
-                os.remove("download_history.json")
             self.status_label.setText("History cleared")
 
 
@@ -716,8 +884,7 @@ class MainWindow(QMainWindow):
         dialog = DeleteConfirmationDialog(self)
         if dialog.exec() == QDialog.Accepted:
             data = index.data(Qt.UserRole)
-            self.history_model.removeRow(index.row())
-            self.save_history()
+            self.history_model.remove_row(index.row())
             self.status_label.setText("Item deleted from history")
 
             if dialog.permanent_delete_checkbox.isChecked():
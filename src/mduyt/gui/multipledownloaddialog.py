@@ -1,12 +1,12 @@
 import os
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-                               QTextEdit, QPushButton, QFileDialog, QMessageBox)
+                               QTextEdit, QPushButton, QFileDialog, QMessageBox, QSpinBox)
 from PySide6.QtCore import Qt, Signal
 
 class MultipleDownloadDialog(QDialog):
-    start_downloads = Signal(list)  # Signal to emit the list of URLs to download
+    start_downloads = Signal(list, int)  # Signal to emit the list of URLs and the concurrency to download with
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, concurrency=3):
         super().__init__(parent)
         self.setWindowTitle("Multiple Download")
         self.setModal(True)
@@ -22,6 +22,16 @@ class MultipleDownloadDialog(QDialog):
         self.text_edit = QTextEdit()
         layout.addWidget(self.text_edit)
 
+        # Concurrency
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Concurrent downloads:"))
+        self.concurrency_spinbox = QSpinBox()
+        self.concurrency_spinbox.setRange(1, 16)
+        self.concurrency_spinbox.setValue(concurrency)
+        concurrency_layout.addWidget(self.concurrency_spinbox)
+        concurrency_layout.addStretch()
+        layout.addLayout(concurrency_layout)
+
         # Buttons
         button_layout = QHBoxLayout()
 
@@ -57,7 +67,7 @@ class MultipleDownloadDialog(QDialog):
             QMessageBox.warning(self, "No URLs", "Please enter at least one URL to download.")
             return
 
-        self.start_downloads.emit(urls)
+        self.start_downloads.emit(urls, self.concurrency_spinbox.value())
         self.accept()
 
 if __name__ == "__main__":
@@ -0,0 +1,24 @@
+def format_bytes(num_bytes):
+    """Format a byte count the way yt-dlp prints it (e.g. 12.34MiB)"""
+    if num_bytes is None:
+        return ""
+    value = float(num_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(value) < 1024 or unit == "TiB":
+            return f"{value:.2f}{unit}"
+        value /= 1024
+
+def format_speed(bytes_per_second):
+    if bytes_per_second is None:
+        return ""
+    return f"{format_bytes(bytes_per_second)}/s"
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
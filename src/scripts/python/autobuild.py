@@ -8,6 +8,8 @@ import sys
 from datetime import datetime
 import platform
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def run_command(command):
     process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
     stdout, stderr = process.communicate()
@@ -86,6 +88,10 @@ def main():
     create_zip(build_dir, zip_filename)
     print(f"Created zip file: {zip_filename}")
 
+    # Per-file manifest, so portable installs only download what changed
+    print("Creating update manifest...")
+    run_command(f'"{sys.executable}" "{os.path.join(SCRIPT_DIR, "makemanifest.py")}" "{zip_filename}" {version}')
+
     # Run platform-specific installer creation
     if target_platform == "windows" and nsis_path:
         if not os.path.exists(nsis_path):
@@ -0,0 +1,28 @@
+# scripts/python/makemanifest.py
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from src.mduyt.core.manifest import MANIFEST_NAME, build_manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the file manifest that portable differential updates use")
+    parser.add_argument("zip", help="Portable zip that will be attached to the release")
+    parser.add_argument("version", help="Release version, e.g. 1.2.0")
+    parser.add_argument("-o", "--output", help=f"Output path (default: {MANIFEST_NAME} next to the zip)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(args.zip)), MANIFEST_NAME)
+    manifest = build_manifest(args.zip, args.version)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+    total = sum(entry["size"] for entry in manifest["files"].values())
+    print(f"Wrote {output}: {len(manifest['files'])} files, {total / 1024 / 1024:.1f} MiB uncompressed")
+    print(f"Attach it to the release as {MANIFEST_NAME} together with {manifest['package']}")
+
+if __name__ == "__main__":
+    main()
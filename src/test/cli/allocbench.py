@@ -0,0 +1,76 @@
+"""Benchmark for the segmented downloader's file allocation modes.
+
+Allocates a large file with each mode, then writes it the way parallel_download does:
+several ranges filled concurrently in 64 KiB chunks. Reports allocation time, write
+throughput, allocated size and, where filefrag is available, the number of extents.
+
+Run from the repository root:
+    python -m src.test.cli.allocbench -s 2048 -d /path/on/target/disk
+"""
+import os
+import re
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from src.mduyt.core.segmented import OutputFile, RangeScheduler
+
+CHUNK_SIZE = 64 * 1024
+
+def count_extents(path):
+    if not shutil.which('filefrag'):
+        return None
+    output = subprocess.run(['filefrag', path], capture_output=True, text=True).stdout
+    match = re.search(r'(\d+) extents? found', output)
+    return int(match.group(1)) if match else None
+
+def allocated_bytes(path):
+    stat = os.stat(path)
+    return stat.st_blocks * 512 if hasattr(stat, 'st_blocks') else stat.st_size
+
+def interleaved_write(output, file_size, connections):
+    # Round-robin over the segments mimics connections landing chunks in arrival order
+    ranges = RangeScheduler(file_size, connections)
+    segments = list(ranges.pending)
+    chunk = os.urandom(CHUNK_SIZE)
+    while segments:
+        for segment in list(segments):
+            size = min(CHUNK_SIZE, segment.remaining)
+            output.write_at(segment.position, chunk[:size])
+            segment.position += size
+            if segment.remaining <= 0:
+                segments.remove(segment)
+
+def bench(mode, directory, file_size, connections):
+    path = os.path.join(directory, f"allocbench-{mode}.bin")
+    try:
+        start = time.perf_counter()
+        output = OutputFile(path, file_size, mode)
+        allocated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        interleaved_write(output, file_size, connections)
+        output.sync()
+        output.close()
+        written = time.perf_counter() - start
+
+        extents = count_extents(path)
+        print(f"{mode:<10} {allocated:>9.2f}s {file_size / written / 1024 / 1024:>11.1f} MiB/s "
+              f"{allocated_bytes(path) / 1024 / 1024:>12.1f} MiB {extents if extents is not None else 'n/a':>9}")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the none, prealloc and falloc allocation modes")
+    parser.add_argument("-s", "--size", type=int, default=1024, help="File size in MiB (default: 1024)")
+    parser.add_argument("-c", "--connections", type=int, default=16, help="Concurrent ranges (default: 16)")
+    parser.add_argument("-d", "--directory", help="Directory on the disk to test (default: system temp dir)")
+    args = parser.parse_args()
+
+    directory = args.directory or tempfile.gettempdir()
+    file_size = args.size * 1024 * 1024
+    print(f"{'mode':<10} {'allocate':>10} {'write':>17} {'allocated':>16} {'extents':>9}")
+    for mode in ('none', 'prealloc', 'falloc'):
+        bench(mode, directory, file_size, args.connections)
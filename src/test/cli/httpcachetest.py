@@ -0,0 +1,94 @@
+"""Check HttpCache against a local stand-in for the GitHub releases API.
+
+Run from the repository root:
+    python -m src.test.cli.httpcachetest
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.mduyt.core.httpcache import HttpCache
+
+class FakeReleases:
+    def __init__(self):
+        self.tag = 'v1.0.0'
+        self.full = 0
+        self.not_modified = 0
+
+    def body(self):
+        return json.dumps({'tag_name': self.tag, 'assets': []}).encode()
+
+    def etag(self):
+        return '"' + hashlib.sha1(self.body()).hexdigest() + '"'
+
+def make_handler(releases):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == releases.etag():
+                releases.not_modified += 1
+                self.send_response(304)
+                self.send_header('ETag', releases.etag())
+                self.end_headers()
+                return
+            releases.full += 1
+            body = releases.body()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', releases.etag())
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    return condition
+
+def main():
+    releases = FakeReleases()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(releases))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/repos/project-mdu/mdu-yt/releases/latest"
+
+    passed = True
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'http-cache.json')
+        cache = HttpCache(path, max_age=60)
+
+        passed &= check(cache.get_json(url)['tag_name'] == 'v1.0.0' and releases.full == 1, "first request fetches")
+        cache.get_json(url)
+        passed &= check(releases.full == 1 and releases.not_modified == 0, "fresh entry is served from memory")
+
+        reopened = HttpCache(path, max_age=60)
+        reopened.get_json(url)
+        passed &= check(releases.full == 1 and releases.not_modified == 0, "entry survives a restart")
+
+        reopened.get_json(url, max_age=0)
+        passed &= check(releases.full == 1 and releases.not_modified == 1, "stale entry is revalidated with a 304")
+
+        releases.tag = 'v1.1.0'
+        tag = reopened.get_json(url, max_age=0)['tag_name']
+        passed &= check(tag == 'v1.1.0' and releases.full == 2, "changed release is fetched again")
+
+        empty = HttpCache(os.path.join(temp_dir, 'empty-cache.json'), max_age=60)
+        tag = empty.get_json(url, headers={'If-None-Match': releases.etag()})['tag_name']
+        passed &= check(tag == 'v1.1.0' and releases.not_modified == 2 and releases.full == 3,
+                        "304 with nothing cached is fetched again without validators")
+
+        server.shutdown()
+        server.server_close()
+        start = time.perf_counter()
+        tag = reopened.get_json(url, max_age=0, timeout=(1, 1))['tag_name']
+        passed &= check(tag == 'v1.1.0', f"offline falls back to the cached entry ({time.perf_counter() - start:.2f}s)")
+
+    print("All checks passed" if passed else "Some checks failed")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
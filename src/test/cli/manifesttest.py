@@ -0,0 +1,184 @@
+"""Check differential updates against a local server that serves a release zip with Range support.
+
+Run from the repository root:
+    python -m src.test.cli.manifesttest
+"""
+import os
+import zlib
+import random
+import shutil
+import zipfile
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.mduyt.core.manifest import (MANIFEST_NAME, OLD_SUFFIX, STAGING_DIR, RangeNotSupported, apply_staged,
+                                     build_manifest, changed_files, cleanup_old_files, fetch_entries, group_ranges,
+                                     load_manifest, local_path, record_installed, removed_files)
+
+class FakePackage:
+    def __init__(self, data):
+        self.data = data
+        # 'range', or how to misbehave: 'ignore' Range, 'truncate' the body, 'corrupt' it
+        self.mode = 'range'
+        self.requests = 0
+        self.served = 0
+
+def make_handler(package):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            package.requests += 1
+            if package.mode == 'ignore' or 'Range' not in self.headers:
+                self.send_body(200, package.data)
+                return
+            first, _, last = self.headers['Range'].partition('=')[2].partition('-')
+            body = package.data[int(first):int(last) + 1]
+            if package.mode == 'corrupt':
+                body = bytes(byte ^ 0xFF for byte in body)
+            self.send_body(206, body, len(body) // 2 if package.mode == 'truncate' else len(body))
+
+        def send_body(self, status, body, length=None):
+            length = len(body) if length is None else length
+            package.served += length
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body[:length])
+            except ConnectionError:
+                # The client stops reading a response it cannot use, such as a 200 to a Range request
+                pass
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def build_zip(path, files):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            info = zipfile.ZipInfo(name)
+            info.compress_type = zipfile.ZIP_STORED if name.endswith('.exe') else zipfile.ZIP_DEFLATED
+            if name.endswith('.dll'):
+                # An extra field moves the entry's data past the bare local header
+                info.extra = b'\xfe\xca\x04\x00test'
+            archive.writestr(info, data)
+    return path
+
+def read_tree(app_dir, names):
+    contents = {}
+    for name in names:
+        try:
+            with open(local_path(app_dir, name), 'rb') as f:
+                contents[name] = f.read()
+        except OSError:
+            contents[name] = None
+    return contents
+
+def old_files(app_dir):
+    return [name for _, _, names in os.walk(app_dir) for name in names if name.endswith(OLD_SUFFIX)]
+
+def check(condition, message):
+    print(("ok   " if condition else "FAIL ") + message)
+    return condition
+
+def expect_error(errors, function, *args):
+    try:
+        function(*args)
+    except errors as e:
+        return e
+    return None
+
+def main():
+    rng = random.Random(1)
+    v1 = {
+        'mdu.exe': rng.randbytes(300000),
+        'lib/Qt6Core.dll': bytes(rng.randrange(4) for _ in range(1000000)),
+        'lib/ffmpeg.exe': rng.randbytes(500000),
+        'lib/filler.bin': rng.randbytes(600000),
+        'empty.txt': b'',
+        'old.txt': b'gone in v2',
+    }
+    v2 = dict(v1, **{'mdu.exe': rng.randbytes(310000), 'lib/new.pyd': b'new' * 1000})
+    del v2['old.txt']
+
+    passed = True
+    with tempfile.TemporaryDirectory() as temp_dir:
+        zip_v1 = build_zip(os.path.join(temp_dir, 'mdu-1.zip'), v1)
+        zip_v2 = build_zip(os.path.join(temp_dir, 'mdu-2.zip'), v2)
+        app_dir = os.path.join(temp_dir, 'app')
+        with zipfile.ZipFile(zip_v1) as archive:
+            archive.extractall(app_dir)
+        with open(os.path.join(app_dir, 'history.db'), 'w') as f:
+            f.write('user data')
+        record_installed(build_manifest(zip_v1, '1'), app_dir)
+
+        with open(zip_v2, 'rb') as f:
+            package = FakePackage(f.read())
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(package))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/mdu-2.zip"
+
+        manifest = build_manifest(zip_v2, '2')
+        installed = load_manifest(os.path.join(app_dir, MANIFEST_NAME))
+        changed = changed_files(manifest, app_dir, installed)
+        removed = removed_files(manifest, installed)
+        passed &= check(sorted(changed) == ['lib/new.pyd', 'mdu.exe'] and removed == ['old.txt'],
+                        "only changed and removed files are picked")
+
+        entry = manifest['files']['lib/Qt6Core.dll']
+        with open(zip_v2, 'rb') as raw:
+            raw.seek(entry['offset'])
+            data = zlib.decompress(raw.read(entry['compressed_size']), -15)
+        passed &= check(data == v2['lib/Qt6Core.dll'], "offsets skip the local header and its extra field")
+
+        entries = [(name, manifest['files'][name]) for name in changed]
+        groups = group_ranges(entries, gap=0)
+        passed &= check(len(groups) == 2 and sum(len(members) for _, _, members in groups) == 2,
+                        "distant entries are separate ranges")
+        grouped = group_ranges(entries, gap=len(package.data))
+        in_zip_order = sorted(changed, key=lambda name: manifest['files'][name]['offset'])
+        passed &= check(len(grouped) == 1 and [name for name, _ in grouped[0][2]] == in_zip_order,
+                        "near entries share one range")
+
+        staging_dir = os.path.join(app_dir, STAGING_DIR)
+        for mode, errors, message in (('ignore', RangeNotSupported, "ignored Range raises RangeNotSupported"),
+                                      ('truncate', OSError, "dropped connection raises an IOError"),
+                                      ('corrupt', OSError, "corrupt data raises an IOError")):
+            package.mode = mode
+            error = expect_error(errors, fetch_entries, url, changed, manifest, staging_dir)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            passed &= check(error is not None, f"{message} ({error})")
+
+        package.mode = 'range'
+        before = read_tree(app_dir, list(v1) + list(v2))
+        fetch_entries(url, changed, manifest, staging_dir)
+        os.remove(local_path(staging_dir, 'mdu.exe'))
+        error = expect_error(OSError, apply_staged, app_dir, staging_dir, sorted(changed), removed)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        passed &= check(error is not None and read_tree(app_dir, list(v1) + list(v2)) == before
+                        and not old_files(app_dir), "failed swap is rolled back")
+
+        package.requests = package.served = 0
+        fetch_entries(url, changed, manifest, staging_dir)
+        apply_staged(app_dir, staging_dir, changed, removed)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        record_installed(manifest, app_dir, removed)
+        after = read_tree(app_dir, v2)
+        passed &= check(after == v2 and not os.path.exists(local_path(app_dir, 'old.txt')),
+                        "files match the new version")
+        passed &= check(package.requests == len(group_ranges(entries)) and package.served < len(package.data) // 2,
+                        f"fetched {package.served} of {len(package.data)} bytes in {package.requests} requests")
+
+        cleanup_old_files(app_dir)
+        passed &= check(not old_files(app_dir) and os.path.exists(os.path.join(app_dir, 'history.db')),
+                        ".old files are cleaned up, user files are kept")
+        installed = load_manifest(os.path.join(app_dir, MANIFEST_NAME))
+        passed &= check(changed_files(manifest, app_dir, installed) == [], "nothing left to update")
+
+        server.shutdown()
+        server.server_close()
+
+    print("All checks passed" if passed else "Some checks failed")
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+"""Microbenchmark for yt-dlp progress parsing.
+
+Run from the repository root:
+    python -m src.test.cli.progressbench -n 200000
+"""
+import re
+import time
+import argparse
+from src.mduyt.core.progress import PROGRESS_PREFIX, parse_record, record_percent
+
+def legacy_parse_progress(line):
+    # Downloader.parse_progress before the structured progress channel
+    progress = 0
+    file_size = ""
+    download_speed = ""
+    eta = ""
+
+    match = re.search(r'(\d+(?:\.\d+)?)%', line)
+    if match:
+        progress = float(match.group(1))
+
+    size_match = re.search(r'of\s+(\S+)', line)
+    if size_match:
+        file_size = size_match.group(1)
+
+    speed_match = re.search(r'at\s+(\S+)', line)
+    if speed_match:
+        download_speed = speed_match.group(1)
+
+    eta_match = re.search(r'ETA\s+(\S+)', line)
+    if eta_match:
+        eta = eta_match.group(1)
+
+    return progress, file_size, download_speed, eta
+
+def legacy_lines(count):
+    return [f"[download]  {i % 1000 / 10:5.1f}% of  123.45MiB at    4.56MiB/s ETA 00:{i % 60:02d}\n"
+            for i in range(count)]
+
+def structured_lines(count):
+    # What PROGRESS_TEMPLATE prints: tab separated values, NA for a missing one
+    return [f"{PROGRESS_PREFIX}downloading\t{i * 1024}\t129446707\tNA\t4781506.5\t{i % 60}\t3\t20\tNA\n"
+            for i in range(count)]
+
+def bench(name, parse, lines, rounds):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for line in lines:
+            parse(line)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<28} {len(lines) / best:>14,.0f} lines/sec")
+
+def parse_structured(line):
+    record = parse_record(line)
+    return record_percent(record), record.total_bytes, record.speed, record.eta
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the regex and progress-template parsers")
+    parser.add_argument("-n", "--lines", type=int, default=100000, help="Lines per round (default: 100000)")
+    parser.add_argument("-r", "--rounds", type=int, default=5, help="Rounds, the best one is reported (default: 5)")
+    args = parser.parse_args()
+
+    bench("regex (legacy)", legacy_parse_progress, legacy_lines(args.lines), args.rounds)
+    bench("progress-template (tsv)", parse_structured, structured_lines(args.lines), args.rounds)